@@ -1,87 +1,217 @@
-from flask import Flask, render_template, redirect, url_for, request, session, flash, make_response
+from flask import Flask, render_template, redirect, url_for, request, session, flash, make_response, g, jsonify, Response, stream_with_context, abort
+import hmac
 import os
 import csv
+import json
+import io
+import zlib
 from dotenv import load_dotenv
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from io import BytesIO
-import qrcode
-import base64
-from datetime import datetime, timedelta
-import crcmod
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+import re
+from db import PoolConexoes
+from cache import CacheVersionado
+from pix import gerar_payload_pix, qr_png
+import migracoes
+import assets
+import miniaturas
+from fila import FilaConfirmacoes
+from eventos import CanalCotas
+import resumo
+import conciliacao
+import busca
+import metricas
+import click
+from flask.cli import AppGroup
 
 load_dotenv()
 app = Flask(__name__)
-app.secret_key = os.urandom(24)
+# Com vários workers a chave precisa ser a mesma em todos, senão o login cai e
+# o QR do Pix (assinado com ela) dá 404 ao trocar de worker
+if not os.getenv("SECRET_KEY") and int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+    raise RuntimeError("Defina SECRET_KEY: com WEB_CONCURRENCY > 1 cada worker teria uma chave diferente")
+app.secret_key = os.getenv("SECRET_KEY") or os.urandom(24)
 app.permanent_session_lifetime = timedelta(days=1)
 
+pool = PoolConexoes(os.getenv("DATABASE_URL"), cursor_factory=metricas.CursorInstrumentado)
+fila_confirmacoes = FilaConfirmacoes(pool)
+canal_cotas = CanalCotas(os.getenv("DATABASE_URL"))
+catalogo = CacheVersionado(ttl=float(os.getenv("CATALOGO_CACHE_TTL", "1")))
+db_cli = AppGroup('db', help="Migrações do banco de dados.")
+app.cli.add_command(db_cli)
+resumo_cli = AppGroup('resumo', help="Resumo de arrecadação do painel.")
+app.cli.add_command(resumo_cli)
+assets_cli = AppGroup('assets', help="Imagens e CSS otimizados em static/dist.")
+app.cli.add_command(assets_cli)
+assets.registrar(app)
+metricas.registrar(app)
+app.jinja_env.filters['versao_imagem'] = miniaturas.versao
+app.jinja_env.globals['status_pagamento'] = conciliacao.STATUS
+
 def get_connection():
-    return psycopg2.connect(os.getenv("DATABASE_URL"), cursor_factory=RealDictCursor)
+    # Uma conexão do pool por contexto da aplicação, devolvida no teardown
+    if 'db_conn' not in g:
+        with metricas.etapa('db_conexao'):
+            g.db_conn = pool.obter()
+    return g.db_conn
+
+@app.teardown_appcontext
+def devolver_conexao(exc):
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        pool.devolver(conn, erro=exc is not None)
+
+@app.before_request
+def iniciar_fila_confirmacoes():
+    # A thread de gravação também recupera diários de workers que morreram
+    fila_confirmacoes.iniciar()
+
+@db_cli.command('upgrade')
+def db_upgrade():
+    """Aplica as migrações pendentes da pasta migrations/."""
+    aplicadas = migracoes.atualizar(
+        get_connection(),
+        ao_aplicar=lambda m: click.echo(f"Aplicada {m['versao']:04d}_{m['nome']}")
+    )
+    if not aplicadas:
+        click.echo("Banco já está na versão mais recente.")
 
-def criar_tabelas_postgres():
+@db_cli.command('status')
+def db_status():
+    """Lista as migrações aplicadas e pendentes."""
+    conn = get_connection()
+    for versao, m in migracoes.aplicadas(conn).items():
+        click.echo(f"{versao:04d}_{m['nome']}  aplicada em {m['aplicada_em']:%Y-%m-%d %H:%M}")
+    for m in migracoes.pendentes(conn):
+        click.echo(f"{m['versao']:04d}_{m['nome']}  pendente")
+
+@resumo_cli.command('reconciliar')
+def resumo_reconciliar():
+    """Recalcula resumo_presentes a partir das contribuições e mostra as divergências."""
+    divergencias = resumo.reconciliar(get_connection())
+    for d in divergencias:
+        click.echo(
+            f"presente {d['presente_id']}: cotas {d['cotas_antes']} → {d['cotas_depois']}, "
+            f"valor {d['valor_antes']} → {d['valor_depois']}"
+        )
+    click.echo(f"{len(divergencias)} presente(s) corrigido(s).")
+
+@assets_cli.command('build')
+@click.option('--tailwind', help="Caminho ou URL do tailwind.min.css (padrão: CDN).")
+def assets_build(tailwind):
+    """Gera variantes WebP/AVIF, o Tailwind purgado e o manifest.json."""
+    assets.construir(tailwind, saida=click.echo)
+
+FUSO_HORARIO = ZoneInfo(os.getenv("APP_TZ", "America/Sao_Paulo"))
+POR_PAGINA = int(os.getenv("ADMIN_POR_PAGINA", "50"))
+
+@app.template_filter('data_hora')
+def formatar_data(data):
+    if not data:
+        return ''
+    return data.astimezone(FUSO_HORARIO).strftime("%d/%m/%Y %H:%M")
+
+def filtros_periodo(tabela):
+    condicoes, params = [], []
+    # Datas do formulário (AAAA-MM-DD) no fuso do casamento; "até" inclui o dia inteiro
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS presentes (
-                id SERIAL PRIMARY KEY,
-                nome TEXT NOT NULL,
-                valor_total REAL NOT NULL,
-                valor_cota REAL NOT NULL,
-                cotas_total INTEGER NOT NULL,
-                cotas_restantes INTEGER NOT NULL,
-                imagem_url TEXT
-            )
-        ''')
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS contribuicoes (
-                id SERIAL PRIMARY KEY,
-                nome_convidado TEXT,
-                presente_id INTEGER,
-                cotas INTEGER,
-                valor_total REAL,
-                data TEXT
-            )
-        ''')
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS confirmacoes (
-                id SERIAL PRIMARY KEY,
-                nome TEXT NOT NULL,
-                data TEXT
-            )
-        ''')
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        print("Erro ao criar tabelas:", e)
-
-criar_tabelas_postgres()
+        de = date.fromisoformat(request.args['de']) if request.args.get('de') else None
+        ate = date.fromisoformat(request.args['ate']) if request.args.get('ate') else None
+    except ValueError:
+        abort(400)
+    if de:
+        condicoes.append(f"{tabela}.data >= (%s::date)::timestamp AT TIME ZONE %s")
+        params += [de, FUSO_HORARIO.key]
+    if ate:
+        condicoes.append(f"{tabela}.data < (%s::date + 1)::timestamp AT TIME ZONE %s")
+        params += [ate, FUSO_HORARIO.key]
+    return condicoes, params
+
+def pagina_keyset(c, consulta, tabela, condicoes, params, cursor):
+    # Paginação por (data, id) decrescente: cada página é uma busca no índice
+    # {tabela}_data_idx a partir da última linha vista, sem OFFSET.
+    condicoes, params = list(condicoes), list(params)
+    if cursor:
+        try:
+            data, id = cursor.rsplit('_', 1)
+            params += [datetime.fromisoformat(data), int(id)]
+            condicoes.append(f"({tabela}.data, {tabela}.id) < (%s, %s)")
+        except ValueError:
+            abort(400)
+    where = f" WHERE {' AND '.join(condicoes)}" if condicoes else ''
+    c.execute(
+        f"{consulta}{where} ORDER BY {tabela}.data DESC, {tabela}.id DESC LIMIT %s",
+        params + [POR_PAGINA + 1]
+    )
+    linhas = c.fetchall()
+    proxima_pagina = None
+    if len(linhas) > POR_PAGINA:
+        linhas = linhas[:POR_PAGINA]
+        args = request.args.to_dict()
+        args['cursor'] = f"{linhas[-1]['data'].isoformat()}_{linhas[-1]['id']}"
+        proxima_pagina = url_for(request.endpoint, **args)
+    return linhas, proxima_pagina
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def consultar_presentes():
+    c = get_connection().cursor()
+    c.execute('SELECT * FROM presentes ORDER BY id')
+    return c.fetchall()
+
+def consultar_versao_catalogo():
+    c = get_connection().cursor()
+    # Muda com qualquer INSERT/UPDATE/DELETE em presentes e só enxerga o que já foi
+    # commitado; nenhuma linha compartilhada precisa ser atualizada pelas reservas
+    c.execute('''
+        SELECT md5(COALESCE(string_agg(id::text || ':' || xmin::text, ',' ORDER BY id), '')) AS versao
+        FROM presentes
+    ''')
+    return c.fetchone()['versao']
+
 @app.route('/presentes')
 def index_presentes():
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('SELECT * FROM presentes')
-    presentes = c.fetchall()
-    conn.close()
-    return render_template('listapresentes.html', presentes=presentes)
+    # Admin e mensagens flash mudam a página, então só o visitante anônimo usa o cache
+    if session.get('logado') or session.get('_flashes'):
+        return render_template('listapresentes.html', presentes=consultar_presentes())
+
+    versao = catalogo.versao(consultar_versao_catalogo)
+    corpo, etag = catalogo.obter(
+        versao,
+        lambda: render_template('listapresentes.html', presentes=consultar_presentes())
+    )
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(corpo)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Vary'] = 'Cookie'
+    return response
+
+@app.route('/eventos/cotas')
+def eventos_cotas():
+    # Server-Sent Events: cada conexão ocupa uma thread do worker (gthread),
+    # por isso o número de clientes por worker é limitado
+    cliente = canal_cotas.conectar()
+    if cliente is None:
+        # O EventSource desiste de vez diante de qualquer status diferente de 200
+        # (e ignora Retry-After): um stream vazio com `retry` o faz tentar de novo depois
+        response = Response('retry: 30000\n\n', mimetype='text/event-stream')
+    else:
+        response = Response(canal_cotas.transmitir(cliente), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @app.route('/confirmar-presenca', methods=['GET', 'POST'])
 def confirmar_presenca():
     if request.method == 'POST':
         nome = request.form['nome']
-        conn = get_connection()
-        c = conn.cursor()
-        c.execute('''
-            INSERT INTO confirmacoes (nome, data)
-            VALUES (%s, %s)
-        ''', (nome, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
-        conn.commit()
-        conn.close()
+        fila_confirmacoes.enfileirar(nome)
         flash('✅ Presença confirmada com sucesso! Obrigado ❤️')
         return redirect(url_for('index'))
     return render_template('confirmar_presenca.html')
@@ -103,7 +233,45 @@ def login():
 def painel_admin():
     if not session.get('logado'):
         return redirect(url_for('login'))
-    return render_template('painel_admin.html')
+    presentes, totais = resumo.painel(get_connection())
+    return render_template('painel_admin.html', presentes=presentes, totais=totais)
+
+@app.route('/admin/db/pool')
+def estatisticas_pool():
+    if not session.get('logado'):
+        return redirect(url_for('login'))
+    return jsonify(pool.estatisticas())
+
+@metricas.registro.coletor
+def metricas_internas():
+    # Lidas na hora da coleta; cada worker do gunicorn expõe só os próprios números
+    qr = qr_png.cache_info()
+    estatisticas = pool.estatisticas()
+    return [
+        ('cache_catalogo_total', 'counter', 'Consultas ao cache do catálogo', ('resultado',),
+         {('acerto',): catalogo.acertos, ('falha',): catalogo.falhas}),
+        ('qr_pix_total', 'counter', 'QR codes PIX pedidos', ('resultado',),
+         {('cache',): qr.hits, ('renderizado',): qr.misses}),
+        ('db_pool', 'gauge', 'Estado do pool de conexões', ('campo',),
+         {(k,): v for k, v in estatisticas.items() if k != 'pid'}),
+        ('fila_confirmacoes_total', 'counter', 'Confirmações gravadas pela fila', ('resultado',),
+         {('gravada',): fila_confirmacoes.gravadas, ('duplicada',): fila_confirmacoes.descartadas}),
+        ('sse_clientes', 'gauge', 'Navegadores conectados em /eventos/cotas', (), {(): canal_cotas.clientes}),
+        ('sse_eventos_total', 'counter', 'Eventos do canal de cotas', ('tipo',),
+         {('notificacao',): canal_cotas.notificacoes, ('ressincronizacao',): canal_cotas.ressincronizacoes,
+          ('recusado',): canal_cotas.recusados}),
+    ]
+
+@app.route('/metrics')
+def exportar_metricas():
+    # Admin logado ou Prometheus com "Authorization: Bearer $METRICS_TOKEN"
+    token = os.getenv("METRICS_TOKEN")
+    autorizado = session.get('logado') or (
+        token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    )
+    if not autorizado:
+        abort(401)
+    return Response(metricas.registro.exportar(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/admin/logout')
 def logout():
@@ -114,12 +282,46 @@ def logout():
 def ver_confirmacoes():
     if not session.get('logado'):
         return redirect(url_for('login'))
+    c = get_connection().cursor()
+    condicoes, params = filtros_periodo('confirmacoes')
+    if request.args.get('nome'):
+        condicao, params_busca = busca.condicao(get_connection(), 'confirmacoes', 'nome', request.args['nome'])
+        condicoes.append(condicao)
+        params += params_busca
+    confirmacoes, proxima_pagina = pagina_keyset(
+        c, 'SELECT * FROM confirmacoes', 'confirmacoes', condicoes, params, request.args.get('cursor')
+    )
+    return render_template('confirmacoes.html', confirmacoes=confirmacoes, proxima_pagina=proxima_pagina)
+
+@app.route('/admin/duplicados')
+def ver_duplicados():
+    if not session.get('logado'):
+        return redirect(url_for('login'))
+    tipo = 'contribuicoes' if request.args.get('tipo') == 'contribuicoes' else 'confirmacoes'
     conn = get_connection()
-    c = conn.cursor()
-    c.execute('SELECT * FROM confirmacoes ORDER BY data DESC')
-    confirmacoes = c.fetchall()
-    conn.close()
-    return render_template('confirmacoes.html', confirmacoes=confirmacoes)
+    itens = busca.itens_contribuicoes(conn) if tipo == 'contribuicoes' else busca.itens_confirmacoes(conn)
+    return render_template('duplicados.html', tipo=tipo, grupos=busca.agrupar_duplicados(itens))
+
+@app.route('/admin/duplicados/mesclar', methods=['POST'])
+def mesclar_duplicados():
+    if not session.get('logado'):
+        return redirect(url_for('login'))
+    tipo = 'contribuicoes' if request.form.get('tipo') == 'contribuicoes' else 'confirmacoes'
+    grupos = []
+    for indice in request.form.getlist('mesclar'):
+        chaves = json.loads(request.form[f'grupo-{indice}'])
+        manter = request.form.get(f'manter-{indice}', type=int)
+        if manter is not None and 0 <= manter < len(chaves):
+            grupos.append((chaves[manter], chaves))
+    if not grupos:
+        flash("Selecione ao menos um grupo para mesclar.")
+    elif tipo == 'contribuicoes':
+        total = busca.mesclar_contribuicoes(get_connection(), grupos)
+        flash(f"✅ {len(grupos)} grupo(s) mesclado(s): {total} contribuição(ões) renomeada(s).")
+    else:
+        total = busca.mesclar_confirmacoes(get_connection(), grupos)
+        flash(f"✅ {len(grupos)} grupo(s) mesclado(s): {total} confirmação(ões) repetida(s) excluída(s).")
+    return redirect(url_for('ver_duplicados', tipo=tipo))
 
 @app.route('/admin/deletar-confirmacao/<int:id>', methods=['POST'])
 def deletar_confirmacao(id):
@@ -129,10 +331,36 @@ def deletar_confirmacao(id):
     c = conn.cursor()
     c.execute('DELETE FROM confirmacoes WHERE id = %s', (id,))
     conn.commit()
-    conn.close()
     flash("❌ Confirmação excluída com sucesso!")
     return redirect(url_for('ver_confirmacoes'))
 
+def atualizar_miniatura(presente_id, imagem_url):
+    # Baixa a imagem uma única vez, no cadastro; a lista só lê do disco
+    if not imagem_url:
+        miniaturas.remover(presente_id)
+        return
+    try:
+        miniaturas.gerar(presente_id, imagem_url)
+    except miniaturas.ErroMiniatura as e:
+        flash(f"⚠️ Não foi possível gerar a miniatura agora ({e}). Ela será gerada no primeiro acesso.")
+
+@app.route('/img/presente/<int:id>')
+def miniatura_presente(id):
+    if not os.path.exists(miniaturas.caminho(id)):
+        # Cache despejado ou disco novo após deploy: gera sob demanda
+        c = get_connection().cursor()
+        c.execute('SELECT imagem_url FROM presentes WHERE id = %s', (id,))
+        row = c.fetchone()
+        # O download pode levar segundos; a conexão volta ao pool antes dele
+        pool.devolver(g.pop('db_conn'))
+        if not row or not row['imagem_url']:
+            abort(404)
+        try:
+            miniaturas.gerar_sob_demanda(id, row['imagem_url'])
+        except miniaturas.ErroMiniatura:
+            return redirect(row['imagem_url'])
+    return miniaturas.servir(id)
+
 @app.route('/admin/add', methods=['GET', 'POST'])
 def add_presente():
     if not session.get('logado'):
@@ -149,68 +377,93 @@ def add_presente():
         c.execute('''
             INSERT INTO presentes (nome, valor_total, valor_cota, cotas_total, cotas_restantes, imagem_url)
             VALUES (%s, %s, %s, %s, %s, %s)
+            RETURNING id
         ''', (nome, valor_total, valor_cota, cotas_total, cotas_total, imagem_url))
+        presente_id = c.fetchone()['id']
         conn.commit()
-        conn.close()
+        catalogo.invalidar()
+        atualizar_miniatura(presente_id, imagem_url)
         flash('✅ Presente adicionado com sucesso!')
         return redirect(url_for('index_presentes'))
     return render_template('add.html')
 
+def reservar_cotas(conn, item_id, nome_convidado, cotas):
+    # Reserva e registro da contribuição numa única instrução: o UPDATE só
+    # acontece se ainda houver cotas suficientes, então duas compras
+    # simultâneas nunca deixam cotas_restantes negativo nem se sobrescrevem.
+    c = conn.cursor()
+    c.execute('''
+        WITH reserva AS (
+            UPDATE presentes
+            SET cotas_restantes = cotas_restantes - %(cotas)s
+            WHERE id = %(id)s AND cotas_restantes >= %(cotas)s
+            RETURNING *
+        ), contribuicao AS (
+            INSERT INTO contribuicoes (presente_id, nome_convidado, cotas, valor_total, data)
+            SELECT id, %(nome)s, %(cotas)s, %(cotas)s * valor_cota, now() FROM reserva
+            RETURNING id, valor_total, txid
+        )
+        SELECT reserva.*, contribuicao.id AS contribuicao_id, contribuicao.valor_total AS valor_pix,
+               contribuicao.txid
+        FROM reserva, contribuicao
+    ''', {
+        'id': item_id,
+        'nome': nome_convidado,
+        'cotas': cotas,
+    })
+    row = c.fetchone()
+    conn.commit()
+    if row:
+        catalogo.invalidar()
+    return row
+
 @app.route('/contribuir/<int:item_id>', methods=['GET', 'POST'])
 def contribuir(item_id):
     conn = get_connection()
     c = conn.cursor()
-    c.execute('SELECT * FROM presentes WHERE id = %s', (item_id,))
-    row = c.fetchone()
-    
-    if not row:
-        conn.close()
-        flash("Presente não encontrado.")
-        return redirect(url_for('index_presentes'))
-
-    # Converter row em dicionário
-    presente = {
-        'id': row['id'],
-        'nome': row['nome'],
-        'valor_total': row['valor_total'],
-        'valor_cota': row['valor_cota'],
-        'cotas_total': row['cotas_total'],
-        'cotas_restantes': row['cotas_restantes'],
-        'imagem_url': row['imagem_url']
-    }
 
     if request.method == 'POST':
         nome_convidado = request.form.get('nome_convidado', 'Anônimo')
         cotas_compradas = int(request.form['cotas'])
-        novas_cotas = presente['cotas_restantes'] - cotas_compradas
-        valor_total = cotas_compradas * presente['valor_cota']
-
-        if novas_cotas >= 0:
-            c.execute('UPDATE presentes SET cotas_restantes = %s WHERE id = %s', (novas_cotas, item_id))
-            c.execute('''
-                INSERT INTO contribuicoes (presente_id, nome_convidado, cotas, valor_total, data)
-                VALUES (%s, %s, %s, %s, %s)
-            ''', (item_id, nome_convidado, cotas_compradas, valor_total, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
-            conn.commit()
-
-        payload_pix = gerar_payload_pix(valor_total)
-        qr = qrcode.make(payload_pix)
-        buffer = BytesIO()
-        qr.save(buffer, format="PNG")
-        img_base64 = base64.b64encode(buffer.getvalue()).decode()
-        conn.close()
+        if cotas_compradas < 1:
+            flash("Escolha pelo menos 1 cota.")
+            return redirect(url_for('contribuir', item_id=item_id))
+
+        reserva = reservar_cotas(conn, item_id, nome_convidado, cotas_compradas)
+        if not reserva:
+            # Só no caminho de falha é preciso consultar o estado atual
+            c.execute('SELECT cotas_restantes FROM presentes WHERE id = %s', (item_id,))
+            row = c.fetchone()
+            if not row:
+                flash("Presente não encontrado.")
+            elif row['cotas_restantes'] == 0:
+                flash("😢 As cotas deste presente acabaram de esgotar.")
+            else:
+                flash(f"😢 Restam apenas {row['cotas_restantes']} cota(s) deste presente.")
+            if row and row['cotas_restantes'] > 0:
+                return redirect(url_for('contribuir', item_id=item_id))
+            return redirect(url_for('index_presentes'))
+
+        valor_total = reserva['valor_pix']
+        payload_pix = gerar_payload_pix(valor_total, reserva['txid'])
+        valor_qr = f'{valor_total:.2f}'
+        qr_url = url_for('qr_pix', valor=valor_qr, txid=reserva['txid'], assinatura=assinatura_qr(valor_qr, reserva['txid']))
 
         return render_template(
             'agradecimento.html',
-            presente=presente,
+            presente=reserva,
             nome_convidado=nome_convidado,
             cotas=cotas_compradas,
             valor_pix=valor_total,
-            img_base64=img_base64,
+            qr_url=qr_url,
             payload_pix=payload_pix
         )
 
-    conn.close()
+    c.execute('SELECT * FROM presentes WHERE id = %s', (item_id,))
+    presente = c.fetchone()
+    if not presente:
+        flash("Presente não encontrado.")
+        return redirect(url_for('index_presentes'))
     return render_template('contribuir.html', presente=presente)
 
 @app.route('/admin/editar-presente/<int:id>', methods=['GET', 'POST'])
@@ -227,48 +480,58 @@ def editar_presente(id):
         cotas_total = int(valor_total / valor_cota)
 
         # Buscar cotas compradas já registradas
-        c.execute('SELECT cotas_total, cotas_restantes FROM presentes WHERE id = %s', (id,))
+        c.execute('SELECT cotas_total, cotas_restantes, imagem_url FROM presentes WHERE id = %s', (id,))
         presente_atual = c.fetchone()
         cotas_compradas = presente_atual['cotas_total'] - presente_atual['cotas_restantes']
         novas_cotas_restantes = cotas_total - cotas_compradas
+        imagem_url = request.form.get('imagem_url', presente_atual['imagem_url'])
 
         c.execute('''
             UPDATE presentes
-            SET valor_total = %s, valor_cota = %s, cotas_total = %s, cotas_restantes = %s
+            SET valor_total = %s, valor_cota = %s, cotas_total = %s, cotas_restantes = %s, imagem_url = %s
             WHERE id = %s
-        ''', (valor_total, valor_cota, cotas_total, novas_cotas_restantes, id))
+        ''', (valor_total, valor_cota, cotas_total, novas_cotas_restantes, imagem_url, id))
         conn.commit()
-        conn.close()
+        catalogo.invalidar()
+        if imagem_url != presente_atual['imagem_url'] or not os.path.exists(miniaturas.caminho(id)):
+            atualizar_miniatura(id, imagem_url)
         flash("✅ Presente atualizado com sucesso!")
         return redirect(url_for('index_presentes'))
 
     # GET: carregar presente para exibir no formulário
     c.execute('SELECT * FROM presentes WHERE id = %s', (id,))
     presente = c.fetchone()
-    conn.close()
     return render_template('editar_presente.html', presente=presente)
 
 @app.route('/admin/contribuicoes')
 def ver_contribuicoes():
     if not session.get('logado'):
         return redirect(url_for('login'))
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
+    c = get_connection().cursor()
+    condicoes, params = filtros_periodo('contribuicoes')
+    if request.args.get('presente', type=int):
+        condicoes.append('contribuicoes.presente_id = %s')
+        params.append(request.args.get('presente', type=int))
+    if request.args.get('nome'):
+        condicao, params_busca = busca.condicao(get_connection(), 'contribuicoes', 'nome_convidado', request.args['nome'])
+        condicoes.append(condicao)
+        params += params_busca
+    contribuicoes, proxima_pagina = pagina_keyset(c, '''
         SELECT 
             contribuicoes.id,
             contribuicoes.nome_convidado,
             presentes.nome,
             contribuicoes.cotas,
             contribuicoes.valor_total,
-            contribuicoes.data
+            contribuicoes.data,
+            contribuicoes.status_pagamento,
+            contribuicoes.txid
         FROM contribuicoes
         JOIN presentes ON contribuicoes.presente_id = presentes.id
-        ORDER BY contribuicoes.data DESC
-    ''')
-    contribuicoes = c.fetchall()
-    conn.close()
-    return render_template('contribuicoes.html', contribuicoes=contribuicoes)
+    ''', 'contribuicoes', condicoes, params, request.args.get('cursor'))
+    c.execute('SELECT id, nome FROM presentes ORDER BY nome')
+    presentes = c.fetchall()
+    return render_template('contribuicoes.html', contribuicoes=contribuicoes, proxima_pagina=proxima_pagina, presentes=presentes)
 
 @app.route('/admin/editar-contribuicao/<int:id>', methods=['GET', 'POST'])
 def editar_contribuicao(id):
@@ -286,12 +549,10 @@ def editar_contribuicao(id):
             WHERE id = %s
         ''', (nome, cotas, valor_total, id))
         conn.commit()
-        conn.close()
         flash("✅ Contribuição atualizada com sucesso!")
         return redirect(url_for('ver_contribuicoes'))
     c.execute('SELECT * FROM contribuicoes WHERE id = %s', (id,))
     contribuicao = c.fetchone()
-    conn.close()
     return render_template('editar_contribuicao.html', contribuicao=contribuicao)
 
 @app.route('/admin/deletar-contribuicao/<int:id>', methods=['POST'])
@@ -308,12 +569,47 @@ def deletar_contribuicao(id):
         c.execute('UPDATE presentes SET cotas_restantes = cotas_restantes + %s WHERE id = %s', (cotas_remover, presente_id))
         c.execute('DELETE FROM contribuicoes WHERE id = %s', (id,))
         conn.commit()
+        catalogo.invalidar()
         flash("❌ Contribuição excluída com sucesso e cotas revertidas.")
     else:
         flash("⚠️ Contribuição não encontrada.")
-    conn.close()
     return redirect(url_for('ver_contribuicoes'))
 
+CONCILIACAO_JANELA = timedelta(hours=float(os.getenv("CONCILIACAO_JANELA_HORAS", "48")))
+PRAZO_PAGAMENTO = timedelta(hours=float(os.getenv("PRAZO_PAGAMENTO_HORAS", "48")))
+
+@app.route('/admin/conciliacao', methods=['GET', 'POST'])
+def conciliar_extrato():
+    if not session.get('logado'):
+        return redirect(url_for('login'))
+    conn = get_connection()
+    resultado = None
+    if request.method == 'POST':
+        arquivo = request.files.get('extrato')
+        if not arquivo or not arquivo.filename:
+            flash("Escolha o arquivo do extrato (CSV ou OFX).")
+            return redirect(url_for('conciliar_extrato'))
+        try:
+            lancamentos = conciliacao.ler_extrato(arquivo.read(), arquivo.filename, FUSO_HORARIO)
+        except conciliacao.ErroExtrato as e:
+            flash(f"⚠️ {e}")
+            return redirect(url_for('conciliar_extrato'))
+        resultado = conciliacao.conciliar(lancamentos, conciliacao.carregar(conn), janela=CONCILIACAO_JANELA)
+        conciliacao.gravar(conn, resultado)
+    pendentes = conciliacao.sem_pagamento(conn, PRAZO_PAGAMENTO)
+    return render_template('conciliacao.html', resultado=resultado, pendentes=pendentes,
+                           prazo_horas=int(PRAZO_PAGAMENTO.total_seconds() // 3600))
+
+@app.route('/admin/conciliacao/liberar', methods=['POST'])
+def liberar_reservas():
+    if not session.get('logado'):
+        return redirect(url_for('login'))
+    total = conciliacao.liberar(get_connection(), request.form.getlist('contribuicao', type=int))
+    if total:
+        catalogo.invalidar()
+    flash(f"✅ {total} reserva(s) sem pagamento removida(s) e cotas devolvidas.")
+    return redirect(url_for('conciliar_extrato'))
+
 @app.route('/admin/delete/<int:item_id>', methods=['POST'])
 def deletar_presente(item_id):
     if not session.get('logado'):
@@ -326,17 +622,24 @@ def deletar_presente(item_id):
         flash('❌ Este presente já recebeu contribuições e não pode ser excluído.')
     else:
         c.execute('DELETE FROM presentes WHERE id = %s', (item_id,))
+        miniaturas.remover(item_id)
         flash('✅ Presente excluído com sucesso!')
     conn.commit()
-    conn.close()
+    catalogo.invalidar()
     return redirect(url_for('index_presentes'))
 
-@app.route('/admin/exportar')
-def exportar_contribuicoes():
-    if not session.get('logado'):
-        return redirect(url_for('login'))
-    conn = get_connection()
-    c = conn.cursor()
+def linhas_exportacao(conn, tamanho_lote=2000):
+    # Cursor nomeado (do lado do servidor): o Postgres envia as linhas em lotes
+    # de `tamanho_lote`, então a memória não cresce com o número de contribuições
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['ID', 'Convidado', 'Presente', 'Cotas', 'Valor (R$)', 'Data', 'Pagamento', 'txid'])
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+
+    c = conn.cursor('exportar_contribuicoes', cursor_factory=psycopg2.extensions.cursor)
+    c.itersize = tamanho_lote
     c.execute('''
         SELECT 
             contribuicoes.id,
@@ -344,61 +647,82 @@ def exportar_contribuicoes():
             presentes.nome,
             contribuicoes.cotas,
             contribuicoes.valor_total,
-            contribuicoes.data
+            contribuicoes.data,
+            contribuicoes.status_pagamento,
+            contribuicoes.txid
         FROM contribuicoes
         JOIN presentes ON contribuicoes.presente_id = presentes.id
-        ORDER BY contribuicoes.data DESC
+        ORDER BY contribuicoes.data DESC, contribuicoes.id DESC
     ''')
-    contribuicoes = c.fetchall()
-    conn.close()
-    output = []
-    header = ['ID', 'Convidado', 'Presente', 'Cotas', 'Valor (R$)', 'Data']
-    output.append(header)
-    for item in contribuicoes:
-        output.append([
-            item['id'],
-            item['nome_convidado'] or 'Anônimo',
-            item['nome'],
-            item['cotas'],
-            f"{item['valor_total']:.2f}".replace('.', ','),
-            item['data']
+    for i, (id, nome_convidado, nome, cotas, valor_total, data, status, txid) in enumerate(c, 1):
+        writer.writerow([
+            id,
+            nome_convidado or 'Anônimo',
+            nome,
+            cotas,
+            f"{valor_total:.2f}".replace('.', ','),
+            formatar_data(data),
+            conciliacao.STATUS[status],
+            txid
         ])
-    response = make_response('\n'.join([','.join(map(str, row)) for row in output]))
-    response.headers['Content-Disposition'] = 'attachment; filename=contribuicoes.csv'
-    response.headers['Content-Type'] = 'text/csv'
+        if i % tamanho_lote == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+    c.close()
+
+def comprimir_gzip(partes):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for parte in partes:
+        dados = compressor.compress(parte.encode('utf-8'))
+        if dados:
+            yield dados
+    yield compressor.flush()
+
+@app.route('/admin/exportar')
+def exportar_contribuicoes():
+    if not session.get('logado'):
+        return redirect(url_for('login'))
+    partes = linhas_exportacao(get_connection())
+    if request.args.get('gzip'):
+        response = Response(stream_with_context(comprimir_gzip(partes)), mimetype='application/gzip')
+        response.headers['Content-Disposition'] = 'attachment; filename=contribuicoes.csv.gz'
+    else:
+        response = Response(stream_with_context(partes), mimetype='text/csv')
+        response.headers['Content-Disposition'] = 'attachment; filename=contribuicoes.csv'
     return response
 
 @app.route('/informacoes-gerais')
 def informacoes_gerais():
     return render_template('informacoes_gerais.html')
 
-def gerar_payload_pix(valor: float) -> str:
-    pix_key = "43130257829"
-    nome = "LUCAS HENRIQUE R RAUGI"
-    cidade = "MATAO"
-    valor_str = f"{valor:.2f}"
-    gui = "BR.GOV.BCB.PIX"
-    gui_field = f"00{len(gui):02d}{gui}"
-    key_field = f"01{len(pix_key):02d}{pix_key}"
-    merchant_account_info = f"{gui_field}{key_field}"
-    mai_field = f"26{len(merchant_account_info):02d}{merchant_account_info}"
-    nome = nome.strip()[:25]
-    cidade = cidade.strip()[:15]
-    payload_sem_crc = (
-        "000201"
-        + mai_field
-        + "52040000"
-        + "5303986"
-        + f"54{len(valor_str):02d}{valor_str}"
-        + "5802BR"
-        + f"59{len(nome):02d}{nome}"
-        + f"60{len(cidade):02d}{cidade}"
-        + "62070503***"
-        + "6304"
-    )
-    crc16 = crcmod.predefined.mkCrcFun('crc-ccitt-false')
-    crc = format(crc16(payload_sem_crc.encode('utf-8')), '04X')
-    return payload_sem_crc + crc
+def assinatura_qr(valor, txid):
+    # Só o app gera URLs de QR com txid, então ninguém consegue pedir a
+    # renderização de txids inventados (cada um seria um PNG novo)
+    chave = app.secret_key if isinstance(app.secret_key, bytes) else app.secret_key.encode('utf-8')
+    return hmac.new(chave, f'{valor}/{txid}'.encode('utf-8'), 'sha256').hexdigest()[:32]
+
+@app.route('/pix/qr/<valor>.png')
+@app.route('/pix/qr/<valor>/<txid>/<assinatura>.png')
+def qr_pix(valor, txid='***', assinatura=None):
+    # Valor e txid fazem parte da URL, então a imagem nunca muda e pode ficar em cache
+    if not re.fullmatch(r'\d{1,6}\.\d{2}', valor) or float(valor) <= 0:
+        return "Valor inválido", 404
+    if txid != '***' and not (
+        re.fullmatch(r'[0-9a-f]{32}', assinatura) and hmac.compare_digest(assinatura, assinatura_qr(valor, txid))
+    ):
+        return "QR Code inválido", 404
+    with metricas.etapa('qr'):
+        png, etag = qr_png(valor, txid)
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(png)
+        response.headers['Content-Type'] = 'image/png'
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,252 @@
+import glob
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import urllib.request
+from io import BytesIO
+
+from flask import request, send_from_directory, url_for
+from markupsafe import Markup
+from PIL import Image
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+PASTA_STATIC = os.path.join(RAIZ, 'static')
+PASTA_DIST = os.path.join(PASTA_STATIC, 'dist')
+MANIFESTO = os.path.join(PASTA_DIST, 'manifest.json')
+TAILWIND_CDN = "https://cdn.jsdelivr.net/npm/tailwindcss@2.2.19/dist/tailwind.min.css"
+IMAGENS = ['img/fundo_vazio.png', 'img/fundo_cha.png']
+SCRIPTS = ['js/cotas.js']
+LARGURAS = [640, 1280, 1920]
+COMPRIMIVEIS = ('.css', '.js', '.svg', '.json')
+
+
+# Build (flask --app app assets build)
+
+def _classes_usadas():
+    # Mesmo critério do extrator padrão do Tailwind: qualquer token dos
+    # templates e dos scripts estáticos pode ser uma classe
+    tokens = set()
+    arquivos = glob.glob(os.path.join(RAIZ, 'templates', '**', '*.html'), recursive=True)
+    arquivos += glob.glob(os.path.join(PASTA_STATIC, 'js', '**', '*.js'), recursive=True)
+    for arquivo in arquivos:
+        with open(arquivo, encoding='utf-8') as f:
+            tokens.update(re.findall(r'[^<>"\'`\s]*[^<>"\'`\s:]', f.read()))
+    return tokens
+
+
+def _blocos(css):
+    # Divide o CSS minificado em (preludio, corpo) no nível mais externo.
+    # Comentários saem do prelúdio antes de os seletores serem divididos; os
+    # banners de licença (/*! ... */) seguem adiante como (comentario, None)
+    i, inicio, profundidade = 0, 0, 0
+    preludio, anterior = None, ''
+    while i < len(css):
+        ch = css[i]
+        if css.startswith('/*', i):
+            fim = css.find('*/', i + 2)
+            fim = len(css) if fim == -1 else fim + 2
+            if profundidade == 0:
+                anterior += css[inicio:i]
+                if css.startswith('/*!', i):
+                    yield css[i:fim], None
+                inicio = fim
+            i = fim
+            continue
+        if ch == '{':
+            if profundidade == 0:
+                preludio, inicio = (anterior + css[inicio:i]).strip(), i + 1
+                anterior = ''
+            profundidade += 1
+        elif ch == '}':
+            profundidade -= 1
+            if profundidade == 0:
+                yield preludio, css[inicio:i]
+                inicio = i + 1
+        elif ch == ';' and profundidade == 0:
+            # @charset/@import soltos
+            yield (anterior + css[inicio:i + 1]).strip(), None
+            inicio, anterior = i + 1, ''
+        i += 1
+
+
+def _dividir_seletores(seletores):
+    partes, atual, profundidade = [], '', 0
+    for ch in seletores:
+        if ch in '([':
+            profundidade += 1
+        elif ch in ')]':
+            profundidade -= 1
+        if ch == ',' and profundidade == 0:
+            partes.append(atual)
+            atual = ''
+        else:
+            atual += ch
+    partes.append(atual)
+    return partes
+
+
+def purgar_css(css, usadas):
+    saida = []
+    for preludio, corpo in _blocos(css):
+        if corpo is None:
+            saida.append(preludio)
+        elif preludio.startswith('@media') or preludio.startswith('@supports'):
+            interno = purgar_css(corpo, usadas)
+            if interno:
+                saida.append(f'{preludio}{{{interno}}}')
+        elif preludio.startswith('@'):
+            saida.append(f'{preludio}{{{corpo}}}')
+        else:
+            mantidos = []
+            for seletor in _dividir_seletores(preludio):
+                classes = [re.sub(r'\\(.)', r'\1', c) for c in re.findall(r'\.((?:\\.|[\w-])+)', seletor)]
+                if all(c in usadas for c in classes):
+                    mantidos.append(seletor)
+            if mantidos:
+                saida.append(f"{','.join(mantidos)}{{{corpo}}}")
+    return ''.join(saida)
+
+
+def _gravar(manifesto, nome_logico, dados, relatorio):
+    base, ext = os.path.splitext(nome_logico)
+    nome = f"{base}.{hashlib.sha256(dados).hexdigest()[:10]}{ext}"
+    destino = os.path.join(PASTA_DIST, nome)
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    with open(destino, 'wb') as f:
+        f.write(dados)
+    tamanhos = {'bruto': len(dados)}
+    if ext in COMPRIMIVEIS:
+        comprimido = gzip.compress(dados, 9, mtime=0)
+        with open(destino + '.gz', 'wb') as f:
+            f.write(comprimido)
+        tamanhos['gzip'] = len(comprimido)
+        if brotli:
+            comprimido = brotli.compress(dados, quality=11)
+            with open(destino + '.br', 'wb') as f:
+                f.write(comprimido)
+            tamanhos['br'] = len(comprimido)
+    manifesto['arquivos'][nome_logico] = f'dist/{nome}'
+    relatorio.append((nome_logico, tamanhos))
+    return f'dist/{nome}'
+
+
+def _variantes(manifesto, nome_logico, relatorio):
+    formatos = [('webp', 'image/webp', {'quality': 80, 'method': 6})]
+    if '.avif' in Image.registered_extensions():
+        formatos.insert(0, ('avif', 'image/avif', {'quality': 60}))
+    with Image.open(os.path.join(PASTA_STATIC, nome_logico)) as original:
+        base = os.path.splitext(nome_logico)[0]
+        variantes = []
+        for largura in LARGURAS:
+            if largura > original.width and variantes:
+                break
+            altura = round(original.height * min(largura, original.width) / original.width)
+            imagem = original.resize((min(largura, original.width), altura), Image.LANCZOS)
+            tipos = {}
+            for ext, tipo, opcoes in formatos:
+                buffer = BytesIO()
+                imagem.save(buffer, format=ext.upper(), **opcoes)
+                tipos[tipo] = _gravar(manifesto, f'{base}-{largura}.{ext}', buffer.getvalue(), relatorio)
+            variantes.append({'largura': largura, 'tipos': tipos})
+    manifesto['variantes'][nome_logico] = variantes
+
+
+def construir(tailwind=None, saida=print):
+    manifesto = {'arquivos': {}, 'variantes': {}}
+    relatorio = []
+
+    for nome_logico in IMAGENS:
+        with open(os.path.join(PASTA_STATIC, nome_logico), 'rb') as f:
+            _gravar(manifesto, nome_logico, f.read(), relatorio)
+        _variantes(manifesto, nome_logico, relatorio)
+
+    for nome_logico in SCRIPTS:
+        with open(os.path.join(PASTA_STATIC, nome_logico), 'rb') as f:
+            _gravar(manifesto, nome_logico, f.read(), relatorio)
+
+    if tailwind and os.path.exists(tailwind):
+        with open(tailwind, 'rb') as f:
+            css = f.read()
+    else:
+        with urllib.request.urlopen(tailwind or TAILWIND_CDN, timeout=60) as resp:
+            css = resp.read()
+    purgado = purgar_css(css.decode('utf-8'), _classes_usadas()).encode('utf-8')
+    relatorio.insert(0, ('tailwind.min.css (CDN)', {'bruto': len(css), 'gzip': len(gzip.compress(css, 9))}))
+    _gravar(manifesto, 'css/tailwind.css', purgado, relatorio)
+
+    with open(MANIFESTO, 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, indent=2)
+
+    saida(f"{'arquivo':<42}{'bruto':>12}{'gzip':>12}{'br':>12}")
+    for nome, tamanhos in relatorio:
+        colunas = ''.join(
+            f"{tamanhos[k] / 1024:>10.1f}KB" if k in tamanhos else f"{'-':>12}"
+            for k in ('bruto', 'gzip', 'br')
+        )
+        saida(f"{nome:<42}{colunas}")
+
+
+# Em execução
+
+def carregar_manifesto():
+    try:
+        with open(MANIFESTO, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'arquivos': {}, 'variantes': {}}
+
+
+def registrar(app):
+    manifesto = carregar_manifesto()
+    arquivos = manifesto['arquivos']
+
+    @app.url_defaults
+    def versionar_static(endpoint, values):
+        # url_for('static', filename='img/x.png') passa a apontar para o
+        # arquivo com hash gerado no build, se ele existir
+        if endpoint == 'static' and values.get('filename') in arquivos:
+            values['filename'] = arquivos[values['filename']]
+
+    @app.route('/static/dist/<path:filename>')
+    def asset_versionado(filename):
+        tipo = mimetypes.guess_type(filename)[0]
+        for codificacao, ext in (('br', '.br'), ('gzip', '.gz')):
+            if request.accept_encodings[codificacao] and os.path.exists(os.path.join(PASTA_DIST, filename + ext)):
+                response = send_from_directory(PASTA_DIST, filename + ext, mimetype=tipo)
+                response.headers['Content-Encoding'] = codificacao
+                break
+        else:
+            response = send_from_directory(PASTA_DIST, filename)
+        # O nome tem o hash do conteúdo, então nunca muda
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+    def fundo_responsivo(seletor, imagem):
+        regras = [f'{seletor} {{ background-image: url("{url_for("static", filename=imagem)}"); }}']
+        variantes = manifesto['variantes'].get(imagem, [])
+        for i, variante in enumerate(variantes):
+            fontes = ', '.join(
+                f'url("{url_for("static", filename=caminho)}") type("{tipo}")'
+                for tipo, caminho in variante['tipos'].items()
+            )
+            regra = f'{seletor} {{ background-image: image-set({fontes}); }}'
+            if i > 0:
+                regra = f"@media (min-width: {variantes[i - 1]['largura'] + 1}px) {{ {regra} }}"
+            regras.append(regra)
+        return Markup('\n        '.join(regras))
+
+    @app.context_processor
+    def assets_contexto():
+        tailwind_css = TAILWIND_CDN
+        if 'css/tailwind.css' in arquivos:
+            tailwind_css = url_for('static', filename='css/tailwind.css')
+        return {'tailwind_css': tailwind_css, 'fundo_responsivo': fundo_responsivo}
@@ -0,0 +1,80 @@
+"""Latência da busca por nome e tempo do relatório de duplicados.
+
+    python bench/busca_nomes.py --database-url postgresql://... --quantidade 30000
+
+Insere `quantidade` confirmações sintéticas (com acentos e grafias parecidas),
+mede a condição de busca de busca.py (GIN de trigramas, se a migração 0008
+conseguiu criá-lo, e o filtro em Python) e o agrupamento de duplicados.
+As linhas de teste são apagadas ao final.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import psycopg2  # noqa: E402
+from psycopg2.extras import RealDictCursor, execute_values  # noqa: E402
+
+import busca  # noqa: E402
+
+PRIMEIROS = ['João', 'Maria', 'José', 'Ana', 'Antônio', 'Francisca', 'Lúcia', 'Márcio', 'Cecília', 'Inês']
+SOBRENOMES = ['Silva', 'Sousa', 'Souza', 'Conceição', 'Araújo', 'Gonçalves', 'Pereira', 'Rodrigues', 'Lima', 'Raugi']
+TERMOS = ['joao silva', 'Conceicao', 'maria sousa', 'araujo', 'lucia lima']
+
+
+def medir(c, termo, repeticoes=20):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        condicao, params = busca.condicao(c.connection, 'confirmacoes', 'nome', termo)
+        c.execute(f'SELECT id FROM confirmacoes WHERE {condicao} ORDER BY data DESC, id DESC LIMIT 50', params)
+        c.fetchall()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL'))
+    parser.add_argument('--quantidade', type=int, default=30000)
+    args = parser.parse_args()
+
+    nomes = [
+        f'{random.choice(PRIMEIROS)} {random.choice(SOBRENOMES)} {random.choice(SOBRENOMES)}'
+        for _ in range(args.quantidade)
+    ]
+    conn = psycopg2.connect(args.database_url, cursor_factory=RealDictCursor)
+    c = conn.cursor()
+    ids = []
+    try:
+        # nome_normalizado NULL: os nomes se repetem e não podem cair no índice único
+        ids = [linha['id'] for linha in execute_values(
+            c, 'INSERT INTO confirmacoes (nome, data) VALUES %s RETURNING id',
+            [(nome,) for nome in nomes], template='(%s, now())', page_size=5000, fetch=True,
+        )]
+        conn.commit()
+        c.execute('ANALYZE confirmacoes')
+
+        for modo in (['banco', 'python'] if busca.trigramas_no_banco(conn) else ['python']):
+            if modo == 'python':
+                os.environ['BUSCA_PYTHON'] = '1'
+            for termo in TERMOS:
+                print(f'busca {modo:<7}{termo!r:<16}{medir(c, termo, 20 if modo == "banco" else 3):9.2f} ms')
+
+        itens = [{'chave': i, 'nome': nome} for i, nome in enumerate(nomes)]
+        inicio = time.perf_counter()
+        grupos = busca.agrupar_duplicados(itens)
+        print(f'duplicados: {len(grupos)} grupos em {time.perf_counter() - inicio:.2f}s')
+    finally:
+        conn.rollback()
+        c.execute('DELETE FROM confirmacoes WHERE id = ANY(%s)', (ids,))
+        conn.commit()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
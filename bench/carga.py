@@ -0,0 +1,315 @@
+"""Teste de carga reproduzível: gunicorn + Postgres descartável + tráfego misto.
+
+    # Postgres temporário (precisa de initdb/pg_ctl no PATH):
+    python bench/carga.py --escala media --mix misto --duracao 30 --saida resultados.json
+
+    # Banco existente (será populado com dados sintéticos!):
+    python bench/carga.py --database-url postgresql://... --escala pequena
+
+    # Comparar com uma execução anterior (sai com código 1 se houver regressão):
+    python bench/carga.py --comparar base.json --saida atual.json
+
+Sobe o app sob gunicorn, aplica as migrações, popula presentes, contribuições
+e confirmações na escala escolhida e dispara requisições concorrentes de
+convidados e admins. Imprime vazão e latência p50/p95/p99 por rota e salva
+tudo em JSON, junto com o commit atual, para comparar entre commits.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import secrets
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+ESCALAS = {
+    'pequena': {'presentes': 20, 'contribuicoes': 1_000, 'confirmacoes': 200},
+    'media': {'presentes': 60, 'contribuicoes': 20_000, 'confirmacoes': 2_000},
+    'grande': {'presentes': 200, 'contribuicoes': 200_000, 'confirmacoes': 20_000},
+}
+
+# (rota, peso, admin?)
+MIXES = {
+    'convidados': [
+        ('GET /presentes', 70, False),
+        ('GET /contribuir/<id>', 10, False),
+        ('POST /contribuir/<id>', 10, False),
+        ('POST /confirmar-presenca', 10, False),
+    ],
+    'admin': [
+        ('GET /admin/painel', 30, True),
+        ('GET /admin/contribuicoes', 30, True),
+        ('GET /admin/confirmacoes', 20, True),
+        ('GET /admin/exportar', 5, True),
+        ('GET /presentes [admin]', 15, True),
+    ],
+}
+MIXES['misto'] = MIXES['convidados'] + [(r, max(1, p // 10), a) for r, p, a in MIXES['admin']]
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class PostgresTemporario:
+    def __init__(self):
+        if not shutil.which('initdb') or not shutil.which('pg_ctl'):
+            sys.exit('initdb/pg_ctl não encontrados; use --database-url')
+        self.pasta = tempfile.mkdtemp(prefix='pg-carga-')
+        self.porta = porta_livre()
+
+    def __enter__(self):
+        dados = os.path.join(self.pasta, 'dados')
+        subprocess.run(['initdb', '-D', dados, '-U', 'postgres', '-A', 'trust'], check=True, capture_output=True)
+        subprocess.run([
+            'pg_ctl', '-D', dados, '-w', '-l', os.path.join(self.pasta, 'log'),
+            '-o', f'-p {self.porta} -k {self.pasta} -c fsync=off', 'start'
+        ], check=True, capture_output=True)
+        return f'postgresql://postgres@127.0.0.1:{self.porta}/postgres'
+
+    def __exit__(self, *exc):
+        subprocess.run(['pg_ctl', '-D', os.path.join(self.pasta, 'dados'), '-m', 'fast', 'stop'], capture_output=True)
+        shutil.rmtree(self.pasta, ignore_errors=True)
+
+
+def popular(dsn, escala):
+    conn = psycopg2.connect(dsn)
+    c = conn.cursor()
+    # Cotas de sobra para que os POSTs de contribuição não esgotem nada durante a carga
+    ids = [linha[0] for linha in execute_values(c, '''
+        INSERT INTO presentes (nome, valor_total, valor_cota, cotas_total, cotas_restantes, imagem_url)
+        VALUES %s RETURNING id
+    ''', [
+        (f'Presente {i}', 10_000_000.0, 10.0, 1_000_000, 1_000_000, None) for i in range(escala['presentes'])
+    ], fetch=True)]
+    execute_values(c, '''
+        INSERT INTO contribuicoes (presente_id, nome_convidado, cotas, valor_total, data)
+        VALUES %s
+    ''', (
+        (random.choice(ids), f'Convidado {i}', 1, 10.0, f'2025-01-01T00:00:00Z')
+        for i in range(escala['contribuicoes'])
+    ), page_size=5000)
+    execute_values(c, 'INSERT INTO confirmacoes (nome, nome_normalizado) VALUES %s', (
+        (f'Confirmado {i}', f'confirmado {i}') for i in range(escala['confirmacoes'])
+    ), page_size=5000)
+    conn.commit()
+    conn.close()
+    return ids
+
+
+class Servidor:
+    def __init__(self, dsn, workers, threads, senha, pasta):
+        self.porta = porta_livre()
+        self.url = f'http://127.0.0.1:{self.porta}'
+        self.env = dict(
+            os.environ,
+            DATABASE_URL=dsn,
+            ADMIN_PASSWORD=senha,
+            SECRET_KEY=secrets.token_hex(16),
+            WEB_CONCURRENCY=str(workers),
+            FILA_DIR=os.path.join(pasta, 'fila'),
+            MINIATURAS_DIR=os.path.join(pasta, 'miniaturas'),
+        )
+        self.comando = [
+            sys.executable, '-m', 'gunicorn', 'app:app', '-b', f'127.0.0.1:{self.porta}',
+            '-w', str(workers), '-k', 'gthread', '--threads', str(threads), '--log-level', 'warning',
+        ]
+
+    def __enter__(self):
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'db', 'upgrade'],
+                       cwd=RAIZ, env=self.env, check=True, capture_output=True)
+        self.processo = subprocess.Popen(self.comando, cwd=RAIZ, env=self.env)
+        limite = time.monotonic() + 30
+        while time.monotonic() < limite:
+            try:
+                urllib.request.urlopen(self.url + '/', timeout=1).close()
+                return self
+            except OSError:
+                time.sleep(0.2)
+        self.processo.terminate()
+        sys.exit('gunicorn não respondeu em 30s')
+
+    def __exit__(self, *exc):
+        self.processo.terminate()
+        self.processo.wait(10)
+
+
+class SemRedirecionar(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def cliente(url, senha, admin):
+    abridor = urllib.request.build_opener(
+        urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), SemRedirecionar
+    )
+    if admin:
+        try:
+            abridor.open(f'{url}/admin/login', data=urllib.parse.urlencode({'senha': senha}).encode())
+        except urllib.error.HTTPError:
+            pass  # o login responde com redirect
+    return abridor
+
+
+def requisicao(abridor, url, rota, ids):
+    caminho = rota.split(' ')[1].replace('<id>', str(random.choice(ids)))
+    dados = None
+    if rota == 'POST /contribuir/<id>':
+        dados = {'nome_convidado': f'carga {secrets.token_hex(4)}', 'cotas': 1}
+    elif rota == 'POST /confirmar-presenca':
+        dados = {'nome': f'carga {secrets.token_hex(6)}'}
+    if dados is not None:
+        dados = urllib.parse.urlencode(dados).encode()
+    try:
+        with abridor.open(url + caminho, data=dados, timeout=60) as resp:
+            resp.read()
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    return 1000 * valores[min(len(valores) - 1, max(0, int(round(p / 100 * len(valores))) - 1))]
+
+
+def executar(url, senha, ids, mix, usuarios, duracao):
+    rotas = [r for r, _, _ in mix]
+    pesos = [p for _, p, _ in mix]
+    admin = {r: a for r, _, a in mix}
+    amostras = []
+    lock = threading.Lock()
+    fim = time.monotonic() + duracao
+
+    def usuario():
+        clientes = {False: cliente(url, senha, False), True: cliente(url, senha, True)}
+        locais = []
+        while time.monotonic() < fim:
+            rota = random.choices(rotas, pesos)[0]
+            inicio = time.perf_counter()
+            status = requisicao(clientes[admin[rota]], url, rota, ids)
+            locais.append((rota, time.perf_counter() - inicio, status))
+        with lock:
+            amostras.extend(locais)
+
+    threads = [threading.Thread(target=usuario) for _ in range(usuarios)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    resultado = {}
+    for rota in rotas:
+        latencias = sorted(l for r, l, _ in amostras if r == rota)
+        erros = sum(1 for r, _, s in amostras if r == rota and not (200 <= s < 400))
+        resultado[rota] = {
+            'requisicoes': len(latencias),
+            'erros': erros,
+            'rps': len(latencias) / duracao,
+            'p50_ms': percentil(latencias, 50),
+            'p95_ms': percentil(latencias, 95),
+            'p99_ms': percentil(latencias, 99),
+        }
+    return resultado
+
+
+def imprimir(resultado):
+    print(f"{'rota':<30}{'req':>8}{'erros':>7}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for rota, r in resultado.items():
+        if not r['requisicoes']:
+            continue
+        print(f"{rota:<30}{r['requisicoes']:>8}{r['erros']:>7}{r['rps']:>9.1f}"
+              f"{r['p50_ms']:>7.1f}ms{r['p95_ms']:>7.1f}ms{r['p99_ms']:>7.1f}ms")
+
+
+def comparar(base, atual, tolerancia):
+    regressoes = []
+    print(f"\n{'rota':<30}{'req/s base':>12}{'req/s atual':>12}{'p95 base':>11}{'p95 atual':>11}")
+    for rota, r in atual['rotas'].items():
+        b = base['rotas'].get(rota)
+        if not b or not b['requisicoes'] or not r['requisicoes']:
+            continue
+        marcador = ''
+        if r['p95_ms'] > b['p95_ms'] * (1 + tolerancia) or r['rps'] < b['rps'] * (1 - tolerancia):
+            marcador = '  <-- regressão'
+            regressoes.append(rota)
+        print(f"{rota:<30}{b['rps']:>12.1f}{r['rps']:>12.1f}{b['p95_ms']:>9.1f}ms{r['p95_ms']:>9.1f}ms{marcador}")
+    return regressoes
+
+
+def commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--database-url', help='Banco existente; sem isso um Postgres temporário é criado')
+    parser.add_argument('--escala', choices=ESCALAS, default='pequena')
+    parser.add_argument('--mix', choices=MIXES, default='misto')
+    parser.add_argument('--usuarios', type=int, default=32)
+    parser.add_argument('--duracao', type=float, default=30)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', help='Arquivo JSON com os resultados')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior')
+    parser.add_argument('--tolerancia', type=float, default=0.10, help='Piora aceita antes de acusar regressão')
+    args = parser.parse_args()
+
+    random.seed(args.semente)
+    senha = secrets.token_hex(8)
+    pasta = tempfile.mkdtemp(prefix='carga-')
+    postgres = PostgresTemporario() if not args.database_url else None
+    try:
+        dsn = postgres.__enter__() if postgres else args.database_url
+        with Servidor(dsn, args.workers, args.threads, senha, pasta) as servidor:
+            ids = popular(dsn, ESCALAS[args.escala])
+            rotas = executar(servidor.url, senha, ids, MIXES[args.mix], args.usuarios, args.duracao)
+    finally:
+        if postgres:
+            postgres.__exit__(None, None, None)
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    resultado = {
+        'commit': commit_atual(),
+        'data': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'parametros': {k: v for k, v in vars(args).items() if k not in ('database_url', 'saida', 'comparar')},
+        'escala': ESCALAS[args.escala],
+        'rotas': rotas,
+    }
+    imprimir(rotas)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2)
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            regressoes = comparar(json.load(f), resultado, args.tolerancia)
+        if regressoes:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
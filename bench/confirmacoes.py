@@ -0,0 +1,75 @@
+"""Inserções/s de confirmações: um commit por POST x fila em lote.
+
+    python bench/confirmacoes.py --database-url postgresql://... --quantidade 2000
+
+O caminho antigo abre uma conexão, faz um INSERT e um commit por confirmação.
+O novo enfileira no diário local (com fsync) e grava em lote via
+FilaConfirmacoes. As linhas de teste são apagadas ao final.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import psycopg2  # noqa: E402
+from psycopg2.extras import RealDictCursor  # noqa: E402
+
+from db import PoolConexoes  # noqa: E402
+from fila import FilaConfirmacoes, normalizar_nome  # noqa: E402
+
+
+def caminho_antigo(dsn, nomes):
+    inicio = time.perf_counter()
+    for nome in nomes:
+        conn = psycopg2.connect(dsn)
+        c = conn.cursor()
+        c.execute('INSERT INTO confirmacoes (nome) VALUES (%s)', (nome,))
+        conn.commit()
+        conn.close()
+    return time.perf_counter() - inicio
+
+
+def caminho_em_lote(dsn, nomes):
+    pool = PoolConexoes(dsn, tamanho=2, overflow=0, cursor_factory=RealDictCursor)
+    fila = FilaConfirmacoes(pool, pasta=tempfile.mkdtemp(prefix='fila-bench-'))
+    inicio = time.perf_counter()
+    for nome in nomes:
+        fila.enfileirar(nome)
+    resposta = time.perf_counter() - inicio
+    fila.descarregar()
+    total = time.perf_counter() - inicio
+    pool.fechar()
+    return resposta, total
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL'))
+    parser.add_argument('--quantidade', type=int, default=2000)
+    args = parser.parse_args()
+
+    prefixo = f'bench {uuid.uuid4().hex[:8]}'
+    antigos = [f'{prefixo} antigo {i}' for i in range(args.quantidade)]
+    novos = [f'{prefixo} novo {i}' for i in range(args.quantidade)]
+
+    try:
+        duracao = caminho_antigo(args.database_url, antigos)
+        print(f'um commit por POST: {args.quantidade / duracao:10.0f} inserções/s')
+        resposta, total = caminho_em_lote(args.database_url, novos)
+        print(f'fila em lote:       {args.quantidade / total:10.0f} inserções/s '
+              f'({args.quantidade / resposta:.0f} confirmações aceitas/s)')
+    finally:
+        conn = psycopg2.connect(args.database_url)
+        c = conn.cursor()
+        c.execute('DELETE FROM confirmacoes WHERE nome LIKE %s', (f'{prefixo}%',))
+        c.execute('DELETE FROM confirmacoes WHERE nome_normalizado LIKE %s', (f'{normalizar_nome(prefixo)}%',))
+        conn.commit()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
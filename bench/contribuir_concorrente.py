@@ -0,0 +1,87 @@
+"""Dispara compras simultâneas de cotas contra um único presente.
+
+Uso (com o app rodando e apontando para o mesmo banco):
+
+    python bench/contribuir_concorrente.py --url http://127.0.0.1:8000 \
+        --database-url postgresql://... --compras 500 --cotas 200 --threads 64
+
+Cria um presente com --cotas cotas, envia --compras POSTs em paralelo para
+/contribuir/<id> e confere ao final que cotas_restantes nunca fica negativo e
+que cotas vendidas == soma das cotas registradas em contribuicoes. Imprime a
+vazão (compras/s) para comparar antes/depois de mudanças em contribuir().
+"""
+import argparse
+import os
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+
+
+class SemRedirecionar(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def comprar(url, item_id, i):
+    dados = urllib.parse.urlencode({'nome_convidado': f'bench {i}', 'cotas': 1}).encode()
+    abridor = urllib.request.build_opener(SemRedirecionar)
+    try:
+        with abridor.open(f'{url}/contribuir/{item_id}', data=dados, timeout=30) as resp:
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL'))
+    parser.add_argument('--compras', type=int, default=500)
+    parser.add_argument('--cotas', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=64)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(args.database_url)
+    c = conn.cursor()
+    c.execute('''
+        INSERT INTO presentes (nome, valor_total, valor_cota, cotas_total, cotas_restantes, imagem_url)
+        VALUES (%s, %s, %s, %s, %s, NULL) RETURNING id
+    ''', ('bench concorrência', args.cotas * 10.0, 10.0, args.cotas, args.cotas))
+    item_id = c.fetchone()[0]
+    conn.commit()
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as executor:
+        status = list(executor.map(lambda i: comprar(args.url, item_id, i), range(args.compras)))
+    duracao = time.perf_counter() - inicio
+
+    c.execute('SELECT cotas_total, cotas_restantes FROM presentes WHERE id = %s', (item_id,))
+    cotas_total, cotas_restantes = c.fetchone()
+    c.execute('SELECT COALESCE(SUM(cotas), 0), COUNT(*) FROM contribuicoes WHERE presente_id = %s', (item_id,))
+    cotas_registradas, contribuicoes = c.fetchone()
+
+    print(f'{args.compras} compras em {duracao:.2f}s ({args.compras / duracao:.1f} compras/s)')
+    print(f'respostas 200: {status.count(200)}, redirecionadas (esgotado): {status.count(302)}')
+    print(f'cotas: total={cotas_total} restantes={cotas_restantes} registradas={cotas_registradas} contribuicoes={contribuicoes}')
+
+    ok = cotas_restantes >= 0 and cotas_total - cotas_restantes == cotas_registradas
+    ok = ok and contribuicoes == status.count(200) == min(args.compras, args.cotas)
+
+    c.execute('DELETE FROM contribuicoes WHERE presente_id = %s', (item_id,))
+    c.execute('DELETE FROM presentes WHERE id = %s', (item_id,))
+    conn.commit()
+    conn.close()
+
+    if not ok:
+        print('FALHA: cotas negativas ou perdidas')
+        sys.exit(1)
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Benchmark do /admin/exportar com contribuições sintéticas.
+
+    python bench/exportar.py --url http://127.0.0.1:8000 \
+        --database-url postgresql://... --senha <ADMIN_PASSWORD> --contribuicoes 100000
+
+Insere --contribuicoes linhas em um presente de teste, faz login como admin e
+mede o tempo até o primeiro byte e o tempo total do CSV (e da variante gzip).
+Os dados sintéticos são apagados ao final.
+"""
+import argparse
+import http.cookiejar
+import os
+import time
+import urllib.parse
+import urllib.request
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+
+def semear(conn, quantidade):
+    c = conn.cursor()
+    c.execute('''
+        INSERT INTO presentes (nome, valor_total, valor_cota, cotas_total, cotas_restantes, imagem_url)
+        VALUES (%s, %s, %s, %s, %s, NULL) RETURNING id
+    ''', ('bench exportação', quantidade * 10.0, 10.0, quantidade, 0))
+    presente_id = c.fetchone()[0]
+    execute_values(c, '''
+        INSERT INTO contribuicoes (presente_id, nome_convidado, cotas, valor_total, data)
+        VALUES %s
+    ''', (
+        (presente_id, f'Convidado {i}, da Silva', 1, 10.0, f'2025-01-01 00:{i // 60 % 60:02d}:{i % 60:02d}')
+        for i in range(quantidade)
+    ), page_size=5000)
+    conn.commit()
+    return presente_id
+
+
+def baixar(abridor, url):
+    inicio = time.perf_counter()
+    with abridor.open(url, timeout=600) as resp:
+        primeiro = resp.read(1)
+        ttfb = time.perf_counter() - inicio
+        tamanho = len(primeiro)
+        while True:
+            bloco = resp.read(65536)
+            if not bloco:
+                break
+            tamanho += len(bloco)
+    return ttfb, time.perf_counter() - inicio, tamanho
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL'))
+    parser.add_argument('--senha', default=os.getenv('ADMIN_PASSWORD'))
+    parser.add_argument('--contribuicoes', type=int, default=100_000)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(args.database_url)
+    presente_id = semear(conn, args.contribuicoes)
+    try:
+        abridor = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        abridor.open(f'{args.url}/admin/login', data=urllib.parse.urlencode({'senha': args.senha}).encode())
+        for nome, caminho in (('csv', '/admin/exportar'), ('csv.gz', '/admin/exportar?gzip=1')):
+            ttfb, total, tamanho = baixar(abridor, args.url + caminho)
+            print(f'{nome:<7} ttfb={ttfb * 1000:8.1f}ms total={total:6.2f}s tamanho={tamanho / 1024:8.0f}KB')
+    finally:
+        c = conn.cursor()
+        c.execute('DELETE FROM contribuicoes WHERE presente_id = %s', (presente_id,))
+        c.execute('DELETE FROM presentes WHERE id = %s', (presente_id,))
+        conn.commit()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""Tempo de inicialização do app (o que cada worker do gunicorn paga ao subir).
+
+    python bench/inicializacao.py --repeticoes 20
+
+Importa app.py em processos novos e imprime a mediana e o p95 do tempo de
+import. Com DATABASE_URL apontando para um banco lento ou fora do ar o tempo
+não deve mudar, já que a inicialização não faz nenhuma consulta.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+CODIGO = 'import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeticoes', type=int, default=20)
+    args = parser.parse_args()
+
+    tempos = []
+    for _ in range(args.repeticoes):
+        saida = subprocess.run(
+            [sys.executable, '-c', CODIGO], cwd=RAIZ, capture_output=True, text=True, check=True
+        )
+        tempos.append(float(saida.stdout.strip().splitlines()[-1]))
+    tempos.sort()
+    p95 = tempos[max(0, int(len(tempos) * 0.95) - 1)]
+    print(f'import app: mediana={statistics.median(tempos) * 1000:.1f}ms p95={p95 * 1000:.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""Micro-benchmark do payload PIX e da geração do QR Code.
+
+    python bench/pix_qr.py
+
+Mede payloads/s, QRs/s sem cache (renderização completa) e QRs/s com o cache
+LRU aquecido, usando um conjunto pequeno de valores de cota repetidos.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pix import gerar_payload_pix, qr_png  # noqa: E402
+
+VALORES = ['25.00', '50.00', '75.00', '100.00', '150.00', '200.00']
+
+
+def medir(nome, funcao, repeticoes):
+    inicio = time.perf_counter()
+    for i in range(repeticoes):
+        funcao(i)
+    duracao = time.perf_counter() - inicio
+    print(f'{nome:<28} {repeticoes / duracao:>12.0f} /s')
+
+
+def main():
+    medir('payload', lambda i: gerar_payload_pix(25 + i % 50), 100_000)
+    medir('qr sem cache', lambda i: qr_png.__wrapped__(VALORES[i % len(VALORES)]), 200)
+    qr_png.cache_clear()
+    medir('qr com cache', lambda i: qr_png(VALORES[i % len(VALORES)]), 100_000)
+    print(qr_png.cache_info())
+
+
+if __name__ == '__main__':
+    main()
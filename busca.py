@@ -0,0 +1,193 @@
+import os
+import re
+from collections import defaultdict
+
+from psycopg2.extras import execute_values
+
+from fila import normalizar_nome
+
+# Mesmo limiar padrão do pg_trgm.strict_word_similarity_threshold
+LIMIAR_BUSCA = 0.5
+LIMIAR_DUPLICADO = 0.6
+LIMIAR_NOME_CONTIDO = 0.8
+JANELA_DUPLICADOS = int(os.getenv("DUPLICADOS_JANELA", "8"))
+_trgm_no_banco = None
+
+
+# Trigramas como no pg_trgm: cada palavra vira "  palavra " e é fatiada de 3 em 3
+
+def _palavras(texto):
+    return re.findall(r'[^\W_]+', normalizar_nome(texto or ''))
+
+
+def trigramas(texto):
+    conjunto = set()
+    for palavra in _palavras(texto):
+        palavra = f'  {palavra} '
+        conjunto.update(palavra[i:i + 3] for i in range(len(palavra) - 2))
+    return conjunto
+
+
+def _similaridade(a, b):
+    if not a or not b:
+        return 0.0
+    comuns = len(a & b)
+    return comuns / (len(a) + len(b) - comuns)
+
+
+def similaridade(a, b):
+    # similarity(a, b)
+    return _similaridade(trigramas(a), trigramas(b))
+
+
+def similaridade_palavras(termo, nome):
+    # strict_word_similarity(termo, nome): melhor trecho de palavras inteiras de `nome`
+    alvo = trigramas(termo)
+    palavras = _palavras(nome)
+    return max(
+        (
+            _similaridade(alvo, trigramas(' '.join(palavras[i:j])))
+            for i in range(len(palavras))
+            for j in range(i + 1, len(palavras) + 1)
+        ),
+        default=0.0,
+    )
+
+
+def _contido(termo, nome, tri_termo, tri_nome, limiar):
+    # Um trecho de `nome` só alcança o limiar se `nome` inteiro tiver ao menos
+    # essa fração dos trigramas de `termo`; o teste barato descarta quase tudo
+    if len(tri_termo & tri_nome) < limiar * len(tri_termo):
+        return False
+    return similaridade_palavras(termo, nome) >= limiar
+
+
+def corresponde(termo, nome):
+    # Mesmo critério da condição SQL: trecho sem acentos ou palavra parecida
+    termo, nome = normalizar_nome(termo), normalizar_nome(nome or '')
+    return termo in nome or _contido(termo, nome, trigramas(termo), trigramas(nome), LIMIAR_BUSCA)
+
+
+# Filtro das listagens
+
+def trigramas_no_banco(conn):
+    # A migração 0008 só cria nome_busca() se pg_trgm e unaccent estiverem disponíveis
+    global _trgm_no_banco
+    if os.getenv("BUSCA_PYTHON"):
+        return False
+    if _trgm_no_banco is None:
+        c = conn.cursor()
+        c.execute("SELECT to_regprocedure('nome_busca(text)') IS NOT NULL AS existe")
+        _trgm_no_banco = c.fetchone()['existe']
+    return _trgm_no_banco
+
+
+def _escapar_like(termo):
+    # "\" é o escape padrão do LIKE; nome_busca() não mexe nesses caracteres
+    return termo.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def condicao(conn, tabela, coluna, termo):
+    # Devolve (sql, params) para a lista de condições de pagina_keyset().
+    # O trecho é literal, como em corresponde(): "%" e "_" do termo não são curingas
+    if trigramas_no_banco(conn):
+        return (
+            f"(nome_busca({tabela}.{coluna}) LIKE '%%' || nome_busca(%s) || '%%'"
+            f" OR nome_busca(%s) <<%% nome_busca({tabela}.{coluna}))",
+            [_escapar_like(termo), termo],
+        )
+    # Sem as extensões: filtra em Python e passa os ids adiante
+    c = conn.cursor()
+    c.execute(f'SELECT id, {coluna} AS nome FROM {tabela}')
+    ids = [linha['id'] for linha in c if corresponde(termo, linha['nome'])]
+    return f"{tabela}.id = ANY(%s)", [ids]
+
+
+# Duplicados
+
+def _parecidos(a, b, tri_a, tri_b):
+    if a == b or _similaridade(tri_a, tri_b) >= LIMIAR_DUPLICADO:
+        return True
+    # "joao" x "joao silva": um nome inteiro contido no outro
+    if len(a) > len(b):
+        a, b, tri_a, tri_b = b, a, tri_b, tri_a
+    return _contido(a, b, tri_a, tri_b, LIMIAR_NOME_CONTIDO)
+
+
+def agrupar_duplicados(itens, janela=JANELA_DUPLICADOS):
+    # Vizinhança ordenada: ordena os nomes normalizados (e de novo com as
+    # palavras invertidas, para pegar erro no primeiro nome) e compara cada
+    # um só com os `janela` seguintes. Custo O(n log n), sem comparar todos
+    # com todos; grupos se formam por união transitiva.
+    nomes = [normalizar_nome(item['nome']) for item in itens]
+    tris = [trigramas(nome) for nome in nomes]
+    pai = list(range(len(itens)))
+
+    def raiz(i):
+        while pai[i] != i:
+            pai[i] = pai[pai[i]]
+            i = pai[i]
+        return i
+
+    ordens = [
+        sorted(range(len(itens)), key=lambda i: nomes[i]),
+        sorted(range(len(itens)), key=lambda i: ' '.join(reversed(nomes[i].split()))),
+    ]
+    for ordem in ordens:
+        for posicao, i in enumerate(ordem):
+            for j in ordem[posicao + 1:posicao + 1 + janela]:
+                if raiz(i) != raiz(j) and _parecidos(nomes[i], nomes[j], tris[i], tris[j]):
+                    pai[raiz(j)] = raiz(i)
+
+    grupos = defaultdict(list)
+    for i, item in enumerate(itens):
+        grupos[raiz(i)].append(item)
+    return sorted(
+        (grupo for grupo in grupos.values() if len(grupo) > 1),
+        key=lambda grupo: (-len(grupo), normalizar_nome(grupo[0]['nome'])),
+    )
+
+
+def itens_confirmacoes(conn):
+    c = conn.cursor()
+    c.execute('SELECT id AS chave, nome, data FROM confirmacoes ORDER BY id')
+    return c.fetchall()
+
+
+def itens_contribuicoes(conn):
+    # Cada grafia distinta do nome é um item; mesclar renomeia todas as contribuições dela
+    c = conn.cursor()
+    c.execute('''
+        SELECT nome_convidado AS chave, nome_convidado AS nome, count(*) AS contribuicoes, max(data) AS data
+        FROM contribuicoes
+        WHERE nome_convidado IS NOT NULL AND btrim(nome_convidado) NOT IN ('', 'Anônimo')
+        GROUP BY nome_convidado
+        ORDER BY nome_convidado
+    ''')
+    return c.fetchall()
+
+
+def mesclar_confirmacoes(conn, grupos):
+    # grupos: [(id mantido, [ids do grupo])]; as outras confirmações são apagadas
+    remover = [id for manter, ids in grupos for id in ids if id != manter]
+    c = conn.cursor()
+    c.execute('DELETE FROM confirmacoes WHERE id = ANY(%s)', (remover,))
+    total = c.rowcount
+    conn.commit()
+    return total
+
+
+def mesclar_contribuicoes(conn, grupos):
+    # grupos: [(grafia mantida, [grafias do grupo])]; as contribuições passam para a grafia mantida
+    pares = [(variante, manter) for manter, variantes in grupos for variante in variantes if variante != manter]
+    if not pares:
+        return 0
+    c = conn.cursor()
+    execute_values(c, '''
+        UPDATE contribuicoes SET nome_convidado = v.canonico
+        FROM (VALUES %s) AS v(variante, canonico)
+        WHERE contribuicoes.nome_convidado = v.variante
+    ''', pares, page_size=len(pares))
+    total = c.rowcount
+    conn.commit()
+    return total
@@ -0,0 +1,46 @@
+import hashlib
+import threading
+import time
+
+
+class CacheVersionado:
+    # Guarda um corpo pré-renderizado junto com a versão do banco que o gerou.
+    # A versão vem de uma consulta barata (ex.: hash do xmin das linhas) e é revalidada
+    # no máximo a cada `ttl` segundos; escritas feitas neste processo chamam
+    # invalidar() para não esperar o ttl.
+    def __init__(self, ttl=1.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._versao_banco = None
+        self._verificado_em = 0.0
+        self._versao = None
+        self._corpo = None
+        self._etag = None
+        self.acertos = 0
+        self.falhas = 0
+
+    def invalidar(self):
+        with self._lock:
+            self._verificado_em = 0.0
+            self._corpo = None
+
+    def versao(self, consultar):
+        agora = time.monotonic()
+        if self._versao_banco is None or agora - self._verificado_em > self.ttl:
+            versao = consultar()
+            with self._lock:
+                self._versao_banco = versao
+                self._verificado_em = agora
+        return self._versao_banco
+
+    def obter(self, versao, renderizar):
+        with self._lock:
+            if self._corpo is not None and self._versao == versao:
+                self.acertos += 1
+                return self._corpo, self._etag
+        corpo = renderizar().encode('utf-8')
+        etag = hashlib.sha1(corpo).hexdigest()
+        with self._lock:
+            self.falhas += 1
+            self._versao, self._corpo, self._etag = versao, corpo, etag
+        return corpo, etag
@@ -0,0 +1,307 @@
+import csv
+import hashlib
+import io
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone
+from decimal import Decimal
+
+from psycopg2.extras import execute_values
+
+TXID = re.compile(r'LC[0-9A-F]{20}')
+CHAVE_LOCK = 7315200402
+MAX_CANDIDATAS = 5
+COLUNAS_CSV = {
+    'data': ('data', 'date', 'data lancamento', 'data do lancamento', 'data movimento', 'data/hora'),
+    'valor': ('valor', 'amount', 'value', 'valor (r$)', 'credito', 'credito (r$)'),
+    'descricao': ('descricao', 'historico', 'description', 'memo', 'lancamento', 'detalhes', 'identificacao'),
+    'id': ('id', 'fitid', 'identificador', 'id transacao', 'id da transacao', 'documento', 'codigo'),
+}
+STATUS = {
+    'pendente': 'Pendente',
+    'pago': '✅ Pago',
+    'sem_correspondencia': '❓ Sem correspondência',
+    'ambiguo': '⚠️ Ambíguo',
+}
+FORMATOS_DATA = ('%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y', '%d/%m/%y', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d')
+
+
+class ErroExtrato(Exception):
+    pass
+
+
+# Leitura do extrato
+
+def _centavos(texto):
+    original = texto
+    texto = texto.strip().replace('R$', '').replace(' ', '')
+    # Um único "C"/"D" no fim marca crédito/débito; o sinal pode vir antes ou depois
+    marcador = texto[-1:].upper()
+    if marcador in ('C', 'D'):
+        texto = texto[:-1]
+    negativo = marcador == 'D' or texto.startswith('-') or texto.endswith('-')
+    texto = texto.removeprefix('+').removeprefix('-').removesuffix('-')
+    # "1.234,56" (banco brasileiro) ou "1,234.56"/"1234.56" (OFX)
+    if ',' in texto and texto.rfind(',') > texto.rfind('.'):
+        texto = texto.replace('.', '').replace(',', '.')
+    else:
+        texto = texto.replace(',', '')
+    # Só dígitos: Decimal aceitaria NaN, Infinity e expoentes
+    if not re.fullmatch(r'\d+(?:\.\d+)?', texto):
+        raise ErroExtrato(f"Valor inválido no extrato: {original.strip()!r}")
+    centavos = int((Decimal(texto) * 100).to_integral_value())
+    return -centavos if negativo else centavos
+
+
+def _data_ofx(texto, fuso):
+    m = re.match(r'(\d{8})(\d{6})?(?:\.\d+)?(?:\[([+-]?\d+(?:\.\d+)?)(?::\w+)?\])?', texto.strip())
+    if not m:
+        raise ErroExtrato(f"Data inválida no OFX: {texto!r}")
+    # Dia 31/02, hora 25 ou fuso [+99] passam pela regex mas não viram data
+    try:
+        data = datetime.strptime(m.group(1) + (m.group(2) or '235959'), '%Y%m%d%H%M%S')
+        if m.group(3):
+            return data.replace(tzinfo=timezone(timedelta(hours=float(m.group(3)))))
+    except (ValueError, OverflowError):
+        raise ErroExtrato(f"Data inválida no OFX: {texto!r}")
+    return data.replace(tzinfo=fuso)
+
+
+def _data_csv(texto, fuso):
+    texto = texto.strip()
+    for formato in FORMATOS_DATA:
+        try:
+            data = datetime.strptime(texto, formato)
+        except ValueError:
+            continue
+        if '%H' not in formato:
+            # Só o dia: o crédito pode ter entrado a qualquer hora, então conta como o fim do dia
+            data = datetime.combine(data.date(), time(23, 59, 59))
+        return data.replace(tzinfo=fuso)
+    try:
+        data = datetime.fromisoformat(texto)
+    except ValueError:
+        raise ErroExtrato(f"Data inválida no extrato: {texto!r}")
+    return data if data.tzinfo else data.replace(tzinfo=fuso)
+
+
+def _normalizar(texto):
+    sem_acentos = ''.join(
+        ch for ch in unicodedata.normalize('NFKD', texto.lower()) if not unicodedata.combining(ch)
+    )
+    return ' '.join(sem_acentos.split())
+
+
+def _ler_ofx(texto, fuso):
+    for bloco in re.split(r'<STMTTRN>', texto, flags=re.I)[1:]:
+        bloco = re.split(r'</STMTTRN>', bloco, flags=re.I)[0]
+        tags = {nome.upper(): valor.strip() for nome, valor in re.findall(r'<(\w+)>([^<\r\n]*)', bloco)}
+        if 'TRNAMT' not in tags or 'DTPOSTED' not in tags:
+            continue
+        yield {
+            'id': tags.get('FITID'),
+            'data': _data_ofx(tags['DTPOSTED'], fuso),
+            'centavos': _centavos(tags['TRNAMT']),
+            'descricao': ' '.join(tags.get(k, '') for k in ('NAME', 'MEMO', 'REFNUM', 'CHECKNUM')).strip(),
+        }
+
+
+def _cabecalho_csv(texto):
+    # Alguns bancos colocam linhas de título antes do cabeçalho, e o separador
+    # varia (";" é o mais comum, já que a vírgula é o separador decimal)
+    for numero, linha in enumerate(texto.splitlines()[:20]):
+        for separador in ';,\t':
+            nomes = [_normalizar(coluna) for coluna in next(csv.reader([linha], delimiter=separador), [])]
+            indices = {
+                campo: next((i for i, nome in enumerate(nomes) if nome in aceitos), None)
+                for campo, aceitos in COLUNAS_CSV.items()
+            }
+            if indices['data'] is not None and indices['valor'] is not None:
+                return numero, separador, indices
+    raise ErroExtrato("Cabeçalho do CSV não encontrado (colunas de data e valor).")
+
+
+def _ler_csv(texto, fuso):
+    numero, separador, indices = _cabecalho_csv(texto)
+    linhas = csv.reader(io.StringIO(texto), delimiter=separador)
+    for _ in range(numero + 1):
+        next(linhas)
+    for linha in linhas:
+        if len(linha) <= max(indices['data'], indices['valor']) or not linha[indices['valor']].strip():
+            continue
+        yield {
+            'id': linha[indices['id']].strip() if indices['id'] is not None else None,
+            'data': _data_csv(linha[indices['data']], fuso),
+            'centavos': _centavos(linha[indices['valor']]),
+            'descricao': linha[indices['descricao']].strip() if indices['descricao'] is not None else '',
+        }
+
+
+def ler_extrato(conteudo, nome_arquivo, fuso):
+    # Devolve só os créditos, cada um com um id estável: o FITID do banco ou,
+    # sem ele, um hash da linha (para reenviar o mesmo extrato não pagar duas vezes)
+    try:
+        texto = conteudo.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        texto = conteudo.decode('latin-1')
+    if nome_arquivo.lower().endswith('.ofx') or '<OFX>' in texto[:2048].upper():
+        lancamentos = _ler_ofx(texto, fuso)
+    else:
+        lancamentos = _ler_csv(texto, fuso)
+    creditos, vistos = [], defaultdict(int)
+    for lancamento in lancamentos:
+        if lancamento['centavos'] <= 0:
+            continue
+        if not lancamento['id']:
+            chave = f"{lancamento['data'].isoformat()}|{lancamento['centavos']}|{lancamento['descricao']}"
+            vistos[chave] += 1
+            lancamento['id'] = hashlib.sha1(f"{chave}|{vistos[chave]}".encode('utf-8')).hexdigest()[:20]
+        creditos.append(lancamento)
+    return creditos
+
+
+# Conciliação
+
+def carregar(conn):
+    # O lock vale até o commit de gravar(): dois uploads simultâneos não disputam as mesmas contribuições
+    c = conn.cursor()
+    c.execute('SELECT pg_advisory_xact_lock(%s)', (CHAVE_LOCK,))
+    c.execute('''
+        SELECT contribuicoes.id, contribuicoes.txid, contribuicoes.valor_total, contribuicoes.data,
+               contribuicoes.nome_convidado, contribuicoes.status_pagamento, contribuicoes.transacao_banco,
+               presentes.nome
+        FROM contribuicoes
+        LEFT JOIN presentes ON presentes.id = contribuicoes.presente_id
+    ''')
+    return c.fetchall()
+
+
+def conciliar(lancamentos, contribuicoes, janela=timedelta(hours=48), tolerancia=timedelta(minutes=30)):
+    # Índices em memória: txid -> contribuição e centavos -> contribuições em
+    # aberto ordenadas por data. Cada lançamento custa uma busca no dicionário
+    # (txid) ou uma busca binária na janela de horário do valor, então o extrato
+    # inteiro é percorrido uma vez só.
+    por_txid = {}
+    por_valor = defaultdict(list)
+    transacoes_usadas = set()
+    for contribuicao in contribuicoes:
+        por_txid[contribuicao['txid']] = contribuicao
+        if contribuicao['status_pagamento'] == 'pago':
+            transacoes_usadas.add(contribuicao['transacao_banco'])
+        elif contribuicao['data']:
+            por_valor[round(contribuicao['valor_total'] * 100)].append(contribuicao)
+    for lista in por_valor.values():
+        lista.sort(key=lambda c: c['data'])
+    datas = {centavos: [c['data'] for c in lista] for centavos, lista in por_valor.items()}
+
+    pagos = {}
+    ja_conciliados = 0
+    sem_txid = []
+    for lancamento in lancamentos:
+        if lancamento['id'] in transacoes_usadas:
+            ja_conciliados += 1
+            continue
+        achada = next(
+            (por_txid[t] for t in TXID.findall(lancamento['descricao'].upper()) if t in por_txid), None
+        )
+        if achada is None:
+            sem_txid.append(lancamento)
+        elif achada['status_pagamento'] == 'pago' or achada['id'] in pagos:
+            ja_conciliados += 1
+        else:
+            pagos[achada['id']] = (achada, lancamento, 'txid')
+
+    # Sem txid: mesmo valor, pago entre `tolerancia` antes e `janela` depois da reserva.
+    # Basta saber se há 0, 1 ou mais candidatas; as ambíguas mostradas param em MAX_CANDIDATAS.
+    ambiguos, sem_correspondencia = [], []
+    for lancamento in sem_txid:
+        lista = por_valor.get(lancamento['centavos'], [])
+        inicio = bisect_left(datas.get(lancamento['centavos'], []), lancamento['data'] - janela)
+        candidatas = []
+        for i in range(inicio, len(lista)):
+            contribuicao = lista[i]
+            if contribuicao['data'] - tolerancia > lancamento['data'] or len(candidatas) == MAX_CANDIDATAS:
+                break
+            if contribuicao['id'] not in pagos:
+                candidatas.append(contribuicao)
+        if len(candidatas) == 1:
+            pagos[candidatas[0]['id']] = (candidatas[0], lancamento, 'valor e horário')
+        elif candidatas:
+            ambiguos.append((lancamento, candidatas))
+        else:
+            sem_correspondencia.append(lancamento)
+
+    ids_ambiguos = {c['id'] for _, candidatas in ambiguos for c in candidatas} - pagos.keys()
+    fim_extrato = max((l['data'] for l in lancamentos), default=None)
+    status = {}
+    for contribuicao in contribuicoes:
+        if contribuicao['status_pagamento'] == 'pago':
+            continue
+        if contribuicao['id'] in pagos:
+            status[contribuicao['id']] = 'pago'
+        elif contribuicao['id'] in ids_ambiguos:
+            status[contribuicao['id']] = 'ambiguo'
+        elif fim_extrato and contribuicao['data'] and contribuicao['data'] <= fim_extrato:
+            # Reservas feitas depois do fim do extrato continuam pendentes
+            status[contribuicao['id']] = 'sem_correspondencia'
+    return {
+        'lancamentos': len(lancamentos),
+        'pagos': list(pagos.values()),
+        'ambiguos': ambiguos,
+        'sem_correspondencia': sem_correspondencia,
+        'ja_conciliados': ja_conciliados,
+        'status': status,
+    }
+
+
+def gravar(conn, resultado):
+    pagos = {contribuicao['id']: lancamento for contribuicao, lancamento, _ in resultado['pagos']}
+    c = conn.cursor()
+    execute_values(c, '''
+        UPDATE contribuicoes
+        SET status_pagamento = v.status, pago_em = v.pago_em, transacao_banco = v.transacao
+        FROM (VALUES %s) AS v(id, status, pago_em, transacao)
+        WHERE contribuicoes.id = v.id AND contribuicoes.status_pagamento <> 'pago'
+    ''', [
+        (id, status, pagos[id]['data'] if id in pagos else None, pagos[id]['id'] if id in pagos else None)
+        for id, status in resultado['status'].items()
+    ], template='(%s::int, %s, %s::timestamptz, %s)', page_size=1000)
+    conn.commit()
+
+
+def sem_pagamento(conn, prazo):
+    c = conn.cursor()
+    c.execute('''
+        SELECT contribuicoes.id, contribuicoes.nome_convidado, contribuicoes.cotas, contribuicoes.valor_total,
+               contribuicoes.data, contribuicoes.status_pagamento, contribuicoes.txid, presentes.nome
+        FROM contribuicoes
+        LEFT JOIN presentes ON presentes.id = contribuicoes.presente_id
+        WHERE contribuicoes.status_pagamento <> 'pago' AND contribuicoes.data < now() - %s
+        ORDER BY contribuicoes.data
+    ''', (prazo,))
+    return c.fetchall()
+
+
+def liberar(conn, ids):
+    # Apaga as reservas não pagas e devolve as cotas aos presentes numa única instrução
+    if not ids:
+        return 0
+    c = conn.cursor()
+    c.execute('''
+        WITH removidas AS (
+            DELETE FROM contribuicoes
+            WHERE id = ANY(%s) AND status_pagamento <> 'pago'
+            RETURNING presente_id, cotas
+        ), devolvidas AS (
+            UPDATE presentes
+            SET cotas_restantes = presentes.cotas_restantes + por_presente.cotas
+            FROM (SELECT presente_id, sum(cotas) AS cotas FROM removidas GROUP BY presente_id) AS por_presente
+            WHERE presentes.id = por_presente.presente_id
+        )
+        SELECT count(*) AS total FROM removidas
+    ''', (list(ids),))
+    total = c.fetchone()['total']
+    conn.commit()
+    return total
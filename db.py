@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolEsgotado(Exception):
+    pass
+
+
+def tamanho_pool_padrao():
+    # Divide o limite de conexões do banco entre os workers do gunicorn
+    # (WEB_CONCURRENCY é a variável que o próprio gunicorn usa para --workers).
+    # Cada worker também mantém uma conexão LISTEN fora do pool (eventos.CanalCotas).
+    if os.getenv("DB_POOL_SIZE"):
+        return max(1, int(os.getenv("DB_POOL_SIZE")))
+    max_conexoes = int(os.getenv("DB_MAX_CONEXOES", "20"))
+    workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+    return max(1, max_conexoes // workers - int(os.getenv("DB_POOL_OVERFLOW", "2")) - 1)
+
+
+class PoolConexoes:
+    def __init__(self, dsn, tamanho=None, overflow=None, timeout=None,
+                 reciclar_apos=None, verificar_apos=None, **kwargs_conexao):
+        self.dsn = dsn
+        self.tamanho = tamanho if tamanho is not None else tamanho_pool_padrao()
+        self.overflow = overflow if overflow is not None else int(os.getenv("DB_POOL_OVERFLOW", "2"))
+        self.timeout = timeout if timeout is not None else float(os.getenv("DB_POOL_TIMEOUT", "10"))
+        # Conexões mais velhas que isso são fechadas e recriadas
+        self.reciclar_apos = reciclar_apos if reciclar_apos is not None else float(os.getenv("DB_POOL_RECICLAR", "1800"))
+        # Conexões ociosas há mais tempo que isso recebem um SELECT 1 antes de sair do pool
+        self.verificar_apos = verificar_apos if verificar_apos is not None else float(os.getenv("DB_POOL_VERIFICAR", "30"))
+        # Sem isso um banco inacessível prende a thread no handshake bem além do timeout do pool
+        self.kwargs_conexao = {'connect_timeout': max(1, int(self.timeout)), **kwargs_conexao}
+        self._pid = os.getpid()
+        self._lock = threading.Condition()
+        self._ociosas = deque()
+        self._criadas = {}
+        # Vagas já reservadas por threads que estão abrindo conexão fora do lock
+        self._conectando = 0
+        self._stats = {
+            'checkouts': 0,
+            'esperas': 0,
+            'tempo_espera': 0.0,
+            'overflow': 0,
+            'criadas': 0,
+            'recicladas': 0,
+            'descartadas': 0,
+            'timeouts': 0,
+        }
+
+    def _resetar_se_fork(self):
+        # Conexões herdadas do processo pai (gunicorn --preload) não podem ser
+        # compartilhadas: cada worker começa um pool vazio.
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._ociosas.clear()
+            self._criadas.clear()
+            self._conectando = 0
+            self._lock = threading.Condition()
+
+    def _conectar(self):
+        # Chamada fora do lock, com a vaga já reservada em _conectando
+        try:
+            conn = psycopg2.connect(self.dsn, **self.kwargs_conexao)
+        except Exception:
+            with self._lock:
+                self._conectando -= 1
+                self._lock.notify()
+            raise
+        with self._lock:
+            self._conectando -= 1
+            self._criadas[id(conn)] = time.monotonic()
+            self._stats['criadas'] += 1
+            if len(self._criadas) > self.tamanho:
+                self._stats['overflow'] += 1
+        return conn
+
+    def _descartar(self, conn):
+        self._criadas.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _saudavel(self, conn, ociosa_desde):
+        if conn.closed:
+            return False
+        if time.monotonic() - self._criadas.get(id(conn), 0) > self.reciclar_apos:
+            with self._lock:
+                self._stats['recicladas'] += 1
+            return False
+        if time.monotonic() - ociosa_desde > self.verificar_apos:
+            try:
+                with conn.cursor() as c:
+                    c.execute('SELECT 1')
+                conn.rollback()
+            except psycopg2.Error:
+                return False
+        return True
+
+    def obter(self):
+        self._resetar_se_fork()
+        inicio = time.monotonic()
+        esperou = False
+        while True:
+            # Sob o lock só se escolhe a conexão ou se reserva a vaga; o handshake
+            # e o SELECT 1 ficam de fora para não travar devolver() e as outras threads
+            with self._lock:
+                while True:
+                    if self._ociosas:
+                        conn, ociosa_desde = self._ociosas.pop()
+                        break
+                    if len(self._criadas) + self._conectando < self.tamanho + self.overflow:
+                        self._conectando += 1
+                        conn = None
+                        break
+                    if not esperou:
+                        esperou = True
+                        self._stats['esperas'] += 1
+                    restante = self.timeout - (time.monotonic() - inicio)
+                    if restante <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolEsgotado(f"Nenhuma conexão livre após {self.timeout:.1f}s")
+                    self._lock.wait(restante)
+
+            if conn is None:
+                conn = self._conectar()
+            elif not self._saudavel(conn, ociosa_desde):
+                with self._lock:
+                    self._stats['descartadas'] += 1
+                    self._descartar(conn)
+                    self._lock.notify()
+                continue
+
+            with self._lock:
+                self._stats['checkouts'] += 1
+                if esperou:
+                    self._stats['tempo_espera'] += time.monotonic() - inicio
+            return conn
+
+    def devolver(self, conn, erro=False):
+        if id(conn) not in self._criadas:
+            # Conexão de outro processo ou já descartada
+            return
+        # Quase toda requisição termina com a transação do SELECT aberta: o
+        # rollback vai até o banco e, como em obter(), fica fora do lock
+        try:
+            if not conn.closed and (erro or conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE):
+                conn.rollback()
+        except psycopg2.Error:
+            pass
+        with self._lock:
+            if id(conn) not in self._criadas:
+                return
+            if conn.closed or len(self._criadas) > self.tamanho:
+                # Conexão quebrada ou de overflow: não volta para o pool
+                self._descartar(conn)
+            else:
+                self._ociosas.append((conn, time.monotonic()))
+            self._lock.notify()
+
+    def fechar(self):
+        with self._lock:
+            while self._ociosas:
+                conn, _ = self._ociosas.pop()
+                self._descartar(conn)
+
+    def estatisticas(self):
+        with self._lock:
+            return dict(
+                self._stats,
+                pid=self._pid,
+                tamanho=self.tamanho,
+                max_overflow=self.overflow,
+                abertas=len(self._criadas),
+                conectando=self._conectando,
+                ociosas=len(self._ociosas),
+                em_uso=len(self._criadas) - len(self._ociosas),
+            )
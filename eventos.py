@@ -0,0 +1,175 @@
+import json
+import logging
+import os
+import queue
+import select
+import threading
+import time
+
+import psycopg2
+
+CANAL = 'cotas_presentes'
+logger = logging.getLogger(__name__)
+
+
+def evento(nome, dados):
+    return f'event: {nome}\ndata: {json.dumps(dados, separators=(",", ":"))}\n\n'
+
+
+class Cliente:
+    def __init__(self, tamanho):
+        self.fila = queue.Queue(tamanho)
+        self.atrasado = False
+
+
+class CanalCotas:
+    # Uma conexão LISTEN por worker repassa os NOTIFY de cotas_presentes para
+    # todos os navegadores conectados ao SSE. O estado atual (id -> cotas
+    # restantes) fica em memória: cada cliente novo recebe um snapshot sem
+    # consultar o banco, e um cliente lento cujo buffer de `buffer` eventos
+    # enche deixa de receber eventos avulsos e ganha um snapshot novo assim
+    # que voltar a ler.
+    def __init__(self, dsn, buffer=None, heartbeat=None, max_clientes=None, duracao=None):
+        self.dsn = dsn
+        self.buffer = buffer or int(os.getenv("SSE_BUFFER", "32"))
+        self.heartbeat = heartbeat or float(os.getenv("SSE_HEARTBEAT", "15"))
+        self.max_clientes = max_clientes or int(os.getenv("SSE_MAX_CLIENTES", "24"))
+        self.duracao = duracao or float(os.getenv("SSE_DURACAO", "300"))
+        # Uma conexão meio aberta (comum no Postgres hospedado) travaria o
+        # SELECT 1 do heartbeat até o timeout de TCP do sistema, que leva minutos;
+        # assim ela cai em cerca de dois heartbeats e o _laco reconecta
+        self.kwargs_conexao = {
+            'connect_timeout': 10,
+            'keepalives': 1,
+            'keepalives_idle': max(1, int(self.heartbeat)),
+            'keepalives_interval': 5,
+            'keepalives_count': 3,
+            'tcp_user_timeout': int(self.heartbeat * 2 * 1000),
+        }
+        self._pid = None
+        self._lock = threading.Lock()
+        self._clientes = set()
+        self._encerrando = threading.Event()
+        self.estado = {}
+        self.notificacoes = 0
+        self.ressincronizacoes = 0
+        self.recusados = 0
+
+    def iniciar(self):
+        # Como na fila de confirmações: cada worker, depois do fork, abre o próprio LISTEN
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._clientes = set()
+            self._encerrando = threading.Event()
+            self.estado = {}
+            threading.Thread(target=self._laco, name='canal-cotas', daemon=True).start()
+            self._pid = os.getpid()
+
+    @property
+    def clientes(self):
+        return len(self._clientes)
+
+    def _laco(self):
+        espera = 1
+        while True:
+            try:
+                self._escutar()
+            except Exception:
+                logger.exception("Erro no LISTEN de cotas")
+            time.sleep(espera)
+            espera = min(espera * 2, 30)
+
+    def _escutar(self):
+        conn = psycopg2.connect(self.dsn, **self.kwargs_conexao)
+        try:
+            conn.autocommit = True
+            c = conn.cursor()
+            c.execute(f'LISTEN {CANAL}')
+            # O snapshot vem depois do LISTEN, então nenhuma mudança cai no intervalo
+            c.execute('SELECT id, cotas_restantes FROM presentes')
+            with self._lock:
+                self.estado = dict(c.fetchall())
+                for cliente in self._clientes:
+                    cliente.atrasado = True
+            while True:
+                if select.select([conn], [], [], self.heartbeat)[0]:
+                    conn.poll()
+                else:
+                    # Sem NOTIFY há um tempo: confirma que a conexão não caiu em silêncio.
+                    # Um NOTIFY que chegue junto com a resposta já fica em conn.notifies
+                    # e o socket não volta a ficar legível por ele
+                    c.execute('SELECT 1')
+                while conn.notifies:
+                    self._receber(conn.notifies.pop(0).payload)
+        finally:
+            conn.close()
+
+    def _receber(self, payload):
+        dados = json.loads(payload)
+        mensagem = evento('cotas', dados)
+        with self._lock:
+            self.notificacoes += 1
+            if dados['cotas_restantes'] is None:
+                self.estado.pop(dados['id'], None)
+            else:
+                self.estado[dados['id']] = dados['cotas_restantes']
+            for cliente in self._clientes:
+                if cliente.atrasado:
+                    continue
+                try:
+                    cliente.fila.put_nowait(mensagem)
+                except queue.Full:
+                    cliente.atrasado = True
+
+    def _snapshot(self, cliente):
+        with self._lock:
+            while not cliente.fila.empty():
+                cliente.fila.get_nowait()
+            cliente.atrasado = False
+            return evento('snapshot', self.estado)
+
+    def encerrar(self):
+        # Chamado no SIGTERM do worker (gunicorn.conf.py): sem isso cada stream
+        # seguraria o worker até `duracao` e ele acabaria morto com SIGKILL
+        self._encerrando.set()
+        with self._lock:
+            for cliente in self._clientes:
+                try:
+                    cliente.fila.put_nowait(None)
+                except queue.Full:
+                    pass
+
+    def conectar(self):
+        self.iniciar()
+        with self._lock:
+            if self._encerrando.is_set() or len(self._clientes) >= self.max_clientes:
+                self.recusados += 1
+                return None
+            cliente = Cliente(self.buffer)
+            self._clientes.add(cliente)
+            return cliente
+
+    def transmitir(self, cliente):
+        # A conexão é encerrada depois de `duracao` segundos para liberar a
+        # thread; o EventSource reconecta sozinho e recebe um snapshot novo
+        try:
+            yield 'retry: 3000\n' + self._snapshot(cliente)
+            fim = time.monotonic() + self.duracao
+            while time.monotonic() < fim and not self._encerrando.is_set():
+                try:
+                    mensagem = cliente.fila.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    mensagem = ': ping\n\n'
+                if mensagem is None:
+                    break
+                if cliente.atrasado:
+                    with self._lock:
+                        self.ressincronizacoes += 1
+                    mensagem = self._snapshot(cliente)
+                yield mensagem
+        finally:
+            with self._lock:
+                self._clientes.discard(cliente)
@@ -0,0 +1,157 @@
+import atexit
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import unicodedata
+from datetime import datetime, timezone
+
+from psycopg2.extras import execute_values
+
+logger = logging.getLogger(__name__)
+_inicio = threading.Lock()
+# Confirmações aceitas ficam aqui até chegarem ao banco: em produção FILA_DIR
+# precisa estar num disco persistente, senão um redeploy pode perder a fila
+PASTA = os.getenv("FILA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'fila_confirmacoes'))
+
+
+def normalizar_nome(nome):
+    sem_acentos = ''.join(
+        ch for ch in unicodedata.normalize('NFKD', nome.lower()) if not unicodedata.combining(ch)
+    )
+    return ' '.join(sem_acentos.split())
+
+
+def _pid_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class FilaConfirmacoes:
+    # Write-behind das confirmações de presença. Cada POST só acrescenta uma
+    # linha ao diário deste processo e faz fsync antes de responder, então uma
+    # confirmação aceita sobrevive a um crash. Uma thread grava os diários no
+    # banco em lote (execute_values) a cada `intervalo` segundos ou quando
+    # `tamanho_lote` confirmações se acumulam. Diários de processos mortos são
+    # recuperados pelo próximo flush de qualquer worker.
+    def __init__(self, pool, tamanho_lote=None, intervalo=None, pasta=PASTA):
+        self.pool = pool
+        self.tamanho_lote = tamanho_lote or int(os.getenv("FILA_LOTE", "100"))
+        self.intervalo = intervalo or float(os.getenv("FILA_INTERVALO", "2"))
+        self.pasta = pasta
+        self._pid = None
+        self._lock = threading.Lock()
+        self._pendentes = 0
+        self._acordar = threading.Event()
+        self.gravadas = 0
+        self.descartadas = 0
+
+    def _diario(self):
+        return os.path.join(self.pasta, f'diario-{os.getpid()}.jsonl')
+
+    def iniciar(self):
+        # Depois do fork do gunicorn cada worker precisa da própria thread
+        if self._pid == os.getpid():
+            return
+        with _inicio:
+            if self._pid == os.getpid():
+                return
+            self._lock = threading.Lock()
+            self._pendentes = 0
+            self._acordar = threading.Event()
+            os.makedirs(self.pasta, exist_ok=True)
+            threading.Thread(target=self._laco, name='fila-confirmacoes', daemon=True).start()
+            atexit.register(self.descarregar)
+            self._pid = os.getpid()
+
+    def enfileirar(self, nome):
+        self.iniciar()
+        linha = json.dumps({
+            'nome': nome,
+            'nome_normalizado': normalizar_nome(nome),
+            'data': datetime.now(timezone.utc).isoformat(),
+        }, ensure_ascii=False) + '\n'
+        with self._lock:
+            with open(self._diario(), 'a', encoding='utf-8') as f:
+                f.write(linha)
+                f.flush()
+                os.fsync(f.fileno())
+            self._pendentes += 1
+            if self._pendentes >= self.tamanho_lote:
+                self._acordar.set()
+
+    def _laco(self):
+        while True:
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+            try:
+                self.descarregar()
+            except Exception:
+                # O diário continua no disco e é tentado de novo no próximo ciclo
+                logger.exception("Erro ao gravar confirmações")
+
+    def descarregar(self):
+        # Fecha o diário atual renomeando-o; novas confirmações vão para um arquivo novo
+        with self._lock:
+            if os.path.exists(self._diario()):
+                os.replace(self._diario(), os.path.join(self.pasta, f'lote-{os.getpid()}-{time.time_ns()}.jsonl'))
+            self._pendentes = 0
+        arquivos = sorted(glob.glob(os.path.join(self.pasta, 'lote-*.jsonl')))
+        for arquivo in glob.glob(os.path.join(self.pasta, 'diario-*.jsonl')):
+            pid = int(os.path.basename(arquivo)[len('diario-'):-len('.jsonl')])
+            if not _pid_vivo(pid):
+                arquivos.append(arquivo)
+        for arquivo in arquivos:
+            self._gravar_arquivo(arquivo)
+
+    def _gravar_arquivo(self, arquivo):
+        try:
+            f = open(arquivo, encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # outro worker já está gravando este arquivo
+            if not os.path.exists(arquivo):
+                return
+            linhas = {}
+            for linha in f:
+                # Uma linha cortada por um crash no meio do write nunca foi confirmada ao convidado
+                try:
+                    item = json.loads(linha)
+                except ValueError:
+                    continue
+                linhas.setdefault(item['nome_normalizado'], item)
+            if linhas:
+                self._inserir(list(linhas.values()))
+            os.remove(arquivo)
+
+    def _inserir(self, itens):
+        conn = self.pool.obter()
+        erro = False
+        try:
+            c = conn.cursor()
+            inseridas = execute_values(c, '''
+                INSERT INTO confirmacoes (nome, nome_normalizado, data)
+                VALUES %s
+                ON CONFLICT (nome_normalizado) DO NOTHING
+                RETURNING id
+            ''', [(i['nome'], i['nome_normalizado'], i['data']) for i in itens], page_size=500, fetch=True)
+            conn.commit()
+            self.gravadas += len(inseridas)
+            self.descartadas += len(itens) - len(inseridas)
+        except Exception:
+            erro = True
+            raise
+        finally:
+            self.pool.devolver(conn, erro=erro)
@@ -0,0 +1,37 @@
+# Carregado automaticamente pelo gunicorn a partir do diretório atual.
+#
+# O atexit da fila de confirmações não roda quando o worker é morto com
+# SIGKILL, o que acontece se ele não terminar dentro do graceful_timeout.
+# Por isso o diário é descarregado já no SIGTERM e de novo na saída do worker,
+# e os streams de SSE são fechados no SIGTERM para o worker sair a tempo.
+import signal
+import threading
+
+
+def _descarregar(worker):
+    import app
+
+    try:
+        app.fila_confirmacoes.descarregar()
+    except Exception:
+        # O diário continua no disco e é recuperado pelo próximo worker
+        worker.log.exception("Erro ao descarregar as confirmações no encerramento do worker")
+
+
+def post_worker_init(worker):
+    original = signal.getsignal(signal.SIGTERM)
+
+    def encerrar(sig, frame):
+        import app
+
+        if callable(original):
+            original(sig, frame)
+        app.canal_cotas.encerrar()
+        # Fora do handler: a gravação usa o banco e pode demorar
+        threading.Thread(target=_descarregar, args=(worker,), name='fila-encerramento').start()
+
+    signal.signal(signal.SIGTERM, encerrar)
+
+
+def worker_exit(server, worker):
+    _descarregar(worker)
@@ -0,0 +1,202 @@
+import bisect
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import before_render_template, g, has_app_context, request, template_rendered
+from psycopg2.extras import RealDictCursor
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def _labels(nomes, valores):
+    if not nomes:
+        return ''
+    return '{' + ','.join(f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)) + '}'
+
+
+class Contador:
+    def __init__(self, nome, ajuda, labels=()):
+        self.nome, self.ajuda, self.labels = nome, ajuda, tuple(labels)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *valores, quantidade=1):
+        with self._lock:
+            self._valores[valores] = self._valores.get(valores, 0) + quantidade
+
+    def exportar(self):
+        yield f'# HELP {self.nome} {self.ajuda}'
+        yield f'# TYPE {self.nome} counter'
+        with self._lock:
+            itens = list(self._valores.items())
+        for valores, total in itens:
+            yield f'{self.nome}{_labels(self.labels, valores)} {total}'
+
+
+class Histograma:
+    def __init__(self, nome, ajuda, labels=(), buckets=BUCKETS):
+        self.nome, self.ajuda, self.labels, self.buckets = nome, ajuda, tuple(labels), buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *valores):
+        i = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                serie = self._series[valores] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][i] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def exportar(self):
+        yield f'# HELP {self.nome} {self.ajuda}'
+        yield f'# TYPE {self.nome} histogram'
+        with self._lock:
+            itens = [(v, (list(s[0]), s[1], s[2])) for v, s in self._series.items()]
+        for valores, (contagens, soma, total) in itens:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + (float('inf'),), contagens):
+                acumulado += contagem
+                le = '+Inf' if limite == float('inf') else repr(limite)
+                yield f'{self.nome}_bucket{_labels(self.labels + ("le",), valores + (le,))} {acumulado}'
+            yield f'{self.nome}_sum{_labels(self.labels, valores)} {soma}'
+            yield f'{self.nome}_count{_labels(self.labels, valores)} {total}'
+
+
+class Registro:
+    def __init__(self):
+        self.metricas = []
+        self.coletores = []
+
+    def contador(self, *args, **kwargs):
+        metrica = Contador(*args, **kwargs)
+        self.metricas.append(metrica)
+        return metrica
+
+    def histograma(self, *args, **kwargs):
+        metrica = Histograma(*args, **kwargs)
+        self.metricas.append(metrica)
+        return metrica
+
+    def coletor(self, funcao):
+        # funcao() devolve [(nome, tipo, ajuda, {labels_tupla: valor})] na hora da coleta
+        self.coletores.append(funcao)
+        return funcao
+
+    def exportar(self):
+        linhas = []
+        for metrica in self.metricas:
+            linhas.extend(metrica.exportar())
+        for funcao in self.coletores:
+            for nome, tipo, ajuda, labels, valores in funcao():
+                linhas.append(f'# HELP {nome} {ajuda}')
+                linhas.append(f'# TYPE {nome} {tipo}')
+                for chave, valor in valores.items():
+                    linhas.append(f'{nome}{_labels(labels, chave)} {valor}')
+        return '\n'.join(linhas) + '\n'
+
+
+registro = Registro()
+requisicoes = registro.contador('http_requests_total', 'Requisições atendidas', ('rota', 'metodo', 'status'))
+latencia = registro.histograma('http_request_duration_seconds', 'Duração das requisições', ('rota', 'metodo'))
+etapas = registro.histograma('etapa_duration_seconds', 'Tempo por etapa da requisição (db, render, qr...)', ('etapa',))
+consultas = registro.histograma('db_query_duration_seconds', 'Duração das consultas SQL', ('consulta',))
+linhas_sql = registro.contador('db_query_rows_total', 'Linhas afetadas/devolvidas pelas consultas', ('consulta',))
+LIMITE_LENTO = float(os.getenv("SLOW_REQUEST_MS", "500")) / 1000
+
+
+def normalizar_sql(sql):
+    if isinstance(sql, bytes):
+        # execute_values manda o SQL já com os valores embutidos; eles não entram no rótulo
+        sql = re.sub(r'VALUES\s*\(.*', 'VALUES ...', sql.decode('utf-8', 'replace'), flags=re.S)
+    return re.sub(r'\s+', ' ', sql).strip()[:160]
+
+
+def registrar_etapa(nome, duracao):
+    etapas.observar(duracao, nome)
+    if has_app_context() and 'etapas' in g:
+        g.etapas[nome] = g.etapas.get(nome, 0.0) + duracao
+
+
+@contextmanager
+def etapa(nome):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar_etapa(nome, time.perf_counter() - inicio)
+
+
+class CursorInstrumentado(RealDictCursor):
+    # Mede cada execute; é o cursor_factory padrão das conexões do pool
+    def execute(self, query, vars=None):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            self._registrar(query, time.perf_counter() - inicio)
+
+    def executemany(self, query, vars_list):
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            self._registrar(query, time.perf_counter() - inicio)
+
+    def _registrar(self, query, duracao):
+        consulta = normalizar_sql(query)
+        consultas.observar(duracao, consulta)
+        if self.rowcount > 0:
+            linhas_sql.inc(consulta, quantidade=self.rowcount)
+        registrar_etapa('db', duracao)
+        if has_app_context() and 'consultas' in g:
+            g.consultas.append((duracao, consulta, self.rowcount))
+
+
+def registrar(app):
+    @app.before_request
+    def iniciar_medicao():
+        g.inicio_requisicao = time.perf_counter()
+        g.etapas = {}
+        g.consultas = []
+
+    @app.after_request
+    def finalizar_medicao(response):
+        if 'inicio_requisicao' not in g:
+            return response
+        total = time.perf_counter() - g.inicio_requisicao
+        rota = request.url_rule.rule if request.url_rule else 'desconhecida'
+        requisicoes.inc(rota, request.method, response.status_code)
+        latencia.observar(total, rota, request.method)
+        response.headers['Server-Timing'] = ', '.join(
+            [f'{nome};dur={duracao * 1000:.1f}' for nome, duracao in g.etapas.items()]
+            + [f'total;dur={total * 1000:.1f}']
+        )
+        if total > LIMITE_LENTO:
+            lentas = sorted(g.consultas, reverse=True)[:3]
+            app.logger.warning(
+                "Requisição lenta: %s %s %.0fms %s consultas=%d mais lentas=%s",
+                request.method, request.path, total * 1000,
+                {k: round(v * 1000, 1) for k, v in g.etapas.items()}, len(g.consultas),
+                [(round(d * 1000, 1), sql, n) for d, sql, n in lentas],
+            )
+        return response
+
+    def inicio_render(sender, template, context, **extra):
+        if has_app_context():
+            g.inicio_render = time.perf_counter()
+
+    def fim_render(sender, template, context, **extra):
+        if has_app_context() and 'inicio_render' in g:
+            registrar_etapa('render', time.perf_counter() - g.pop('inicio_render'))
+
+    before_render_template.connect(inicio_render, app, weak=False)
+    template_rendered.connect(fim_render, app, weak=False)
@@ -0,0 +1,84 @@
+import hashlib
+import os
+import re
+
+PASTA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+# Chave arbitrária e fixa do pg_advisory_lock: só um processo migra por vez
+CHAVE_LOCK = 7315200401
+
+
+class MigracaoAlterada(Exception):
+    pass
+
+
+def listar_migracoes(pasta=PASTA):
+    migracoes = []
+    for arquivo in sorted(os.listdir(pasta)):
+        encontrado = re.fullmatch(r'(\d+)_(\w+)\.sql', arquivo)
+        if not encontrado:
+            continue
+        with open(os.path.join(pasta, arquivo), encoding='utf-8') as f:
+            sql = f.read()
+        migracoes.append({
+            'versao': int(encontrado.group(1)),
+            'nome': encontrado.group(2),
+            'sql': sql,
+            'checksum': hashlib.sha256(sql.encode('utf-8')).hexdigest(),
+        })
+    return migracoes
+
+
+def _criar_tabela_versoes(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migracoes (
+            versao INTEGER PRIMARY KEY,
+            nome TEXT NOT NULL,
+            checksum TEXT NOT NULL,
+            aplicada_em TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    ''')
+
+
+def aplicadas(conn):
+    c = conn.cursor()
+    _criar_tabela_versoes(c)
+    c.execute('SELECT versao, nome, checksum, aplicada_em FROM schema_migracoes ORDER BY versao')
+    linhas = c.fetchall()
+    conn.commit()
+    return {linha['versao']: linha for linha in linhas}
+
+
+def pendentes(conn, migracoes=None):
+    migracoes = listar_migracoes() if migracoes is None else migracoes
+    ja_aplicadas = aplicadas(conn)
+    for migracao in migracoes:
+        aplicada = ja_aplicadas.get(migracao['versao'])
+        if aplicada and aplicada['checksum'] != migracao['checksum']:
+            raise MigracaoAlterada(
+                f"A migração {migracao['versao']:04d}_{migracao['nome']} foi alterada depois de aplicada"
+            )
+    return [m for m in migracoes if m['versao'] not in ja_aplicadas]
+
+
+def atualizar(conn, ao_aplicar=None):
+    c = conn.cursor()
+    c.execute('SELECT pg_advisory_lock(%s)', (CHAVE_LOCK,))
+    try:
+        # Consulta depois do lock: outro processo pode ter acabado de migrar
+        a_aplicar = pendentes(conn)
+        for migracao in a_aplicar:
+            c.execute(migracao['sql'])
+            c.execute(
+                'INSERT INTO schema_migracoes (versao, nome, checksum) VALUES (%s, %s, %s)',
+                (migracao['versao'], migracao['nome'], migracao['checksum'])
+            )
+            conn.commit()
+            if ao_aplicar:
+                ao_aplicar(migracao)
+        return a_aplicar
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        c.execute('SELECT pg_advisory_unlock(%s)', (CHAVE_LOCK,))
+        conn.commit()
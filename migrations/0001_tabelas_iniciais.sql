@@ -0,0 +1,26 @@
+-- Esquema original. IF NOT EXISTS para que bancos criados antes das migrações
+-- possam ser registrados nesta versão sem erro.
+CREATE TABLE IF NOT EXISTS presentes (
+    id SERIAL PRIMARY KEY,
+    nome TEXT NOT NULL,
+    valor_total REAL NOT NULL,
+    valor_cota REAL NOT NULL,
+    cotas_total INTEGER NOT NULL,
+    cotas_restantes INTEGER NOT NULL,
+    imagem_url TEXT
+);
+
+CREATE TABLE IF NOT EXISTS contribuicoes (
+    id SERIAL PRIMARY KEY,
+    nome_convidado TEXT,
+    presente_id INTEGER,
+    cotas INTEGER,
+    valor_total REAL,
+    data TEXT
+);
+
+CREATE TABLE IF NOT EXISTS confirmacoes (
+    id SERIAL PRIMARY KEY,
+    nome TEXT NOT NULL,
+    data TEXT
+);
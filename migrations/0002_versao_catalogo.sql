@@ -0,0 +1,20 @@
+-- Versão do catálogo compartilhada entre os workers: qualquer escrita em
+-- presentes incrementa o número na mesma transação
+CREATE TABLE IF NOT EXISTS catalogo_versao (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    versao BIGINT NOT NULL
+);
+
+INSERT INTO catalogo_versao (id, versao) VALUES (1, 0) ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION incrementar_versao_catalogo() RETURNS trigger AS $$
+BEGIN
+    UPDATE catalogo_versao SET versao = versao + 1 WHERE id = 1;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS presentes_versao_catalogo ON presentes;
+CREATE TRIGGER presentes_versao_catalogo
+AFTER INSERT OR UPDATE OR DELETE ON presentes
+FOR EACH STATEMENT EXECUTE FUNCTION incrementar_versao_catalogo();
@@ -0,0 +1,37 @@
+-- data era TEXT no formato "AAAA-MM-DD HH:MM:SS"
+DO $$
+DECLARE
+    tabela TEXT;
+BEGIN
+    FOREACH tabela IN ARRAY ARRAY['contribuicoes', 'confirmacoes'] LOOP
+        IF (SELECT data_type FROM information_schema.columns
+            WHERE table_name = tabela AND column_name = 'data') = 'text' THEN
+            EXECUTE format(
+                'ALTER TABLE %I
+                    ALTER COLUMN data TYPE TIMESTAMPTZ USING COALESCE(NULLIF(data, '''')::timestamptz, now()),
+                    ALTER COLUMN data SET DEFAULT now(),
+                    ALTER COLUMN data SET NOT NULL',
+                tabela
+            );
+        END IF;
+    END LOOP;
+END
+$$;
+
+-- NOT VALID: contribuições órfãs antigas não impedem a migração, mas as novas são verificadas
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.table_constraints
+        WHERE table_name = 'contribuicoes' AND constraint_type = 'FOREIGN KEY'
+    ) THEN
+        ALTER TABLE contribuicoes
+        ADD CONSTRAINT contribuicoes_presente_id_fkey
+        FOREIGN KEY (presente_id) REFERENCES presentes(id) NOT VALID;
+    END IF;
+END
+$$;
+
+CREATE INDEX IF NOT EXISTS contribuicoes_presente_id_idx ON contribuicoes (presente_id);
+CREATE INDEX IF NOT EXISTS contribuicoes_data_idx ON contribuicoes (data DESC, id DESC);
+CREATE INDEX IF NOT EXISTS confirmacoes_data_idx ON confirmacoes (data DESC, id DESC);
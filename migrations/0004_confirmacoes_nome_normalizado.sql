@@ -0,0 +1,21 @@
+-- Nome sem acentos, minúsculo e com espaços colapsados, usado para descartar
+-- confirmações repetidas. Deve bater com fila.normalizar_nome().
+ALTER TABLE confirmacoes ADD COLUMN IF NOT EXISTS nome_normalizado TEXT;
+
+-- Duplicatas que já existiam continuam visíveis: só a primeira de cada nome
+-- recebe o valor normalizado (NULLs não conflitam no índice único).
+UPDATE confirmacoes SET nome_normalizado = primeiras.normalizado
+FROM (
+    SELECT DISTINCT ON (normalizado) id, normalizado
+    FROM (
+        SELECT id, btrim(regexp_replace(
+            translate(lower(nome), 'áàâãäéèêëíìîïóòôõöúùûüçñ', 'aaaaaeeeeiiiiooooouuuucn'),
+            '\s+', ' ', 'g'
+        )) AS normalizado
+        FROM confirmacoes
+    ) AS todas
+    ORDER BY normalizado, id
+) AS primeiras
+WHERE confirmacoes.id = primeiras.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS confirmacoes_nome_normalizado_idx ON confirmacoes (nome_normalizado);
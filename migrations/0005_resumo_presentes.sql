@@ -0,0 +1,47 @@
+-- Resumo por presente mantido por trigger, para o painel não precisar
+-- agregar a tabela de contribuições inteira
+CREATE TABLE IF NOT EXISTS resumo_presentes (
+    presente_id INTEGER PRIMARY KEY REFERENCES presentes(id) ON DELETE CASCADE,
+    contribuicoes INTEGER NOT NULL DEFAULT 0,
+    cotas_vendidas INTEGER NOT NULL DEFAULT 0,
+    valor_arrecadado DOUBLE PRECISION NOT NULL DEFAULT 0,
+    ultima_contribuicao TIMESTAMPTZ
+);
+
+CREATE OR REPLACE FUNCTION atualizar_resumo_presentes() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.presente_id IS NOT NULL THEN
+        UPDATE resumo_presentes
+        SET contribuicoes = contribuicoes - 1,
+            cotas_vendidas = cotas_vendidas - COALESCE(OLD.cotas, 0),
+            valor_arrecadado = valor_arrecadado - COALESCE(OLD.valor_total, 0),
+            ultima_contribuicao = (
+                SELECT max(data) FROM contribuicoes WHERE presente_id = OLD.presente_id
+            )
+        WHERE presente_id = OLD.presente_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.presente_id IS NOT NULL THEN
+        INSERT INTO resumo_presentes (presente_id, contribuicoes, cotas_vendidas, valor_arrecadado, ultima_contribuicao)
+        VALUES (NEW.presente_id, 1, COALESCE(NEW.cotas, 0), COALESCE(NEW.valor_total, 0), NEW.data)
+        ON CONFLICT (presente_id) DO UPDATE
+        SET contribuicoes = resumo_presentes.contribuicoes + 1,
+            cotas_vendidas = resumo_presentes.cotas_vendidas + EXCLUDED.cotas_vendidas,
+            valor_arrecadado = resumo_presentes.valor_arrecadado + EXCLUDED.valor_arrecadado,
+            ultima_contribuicao = GREATEST(resumo_presentes.ultima_contribuicao, EXCLUDED.ultima_contribuicao);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS contribuicoes_resumo ON contribuicoes;
+CREATE TRIGGER contribuicoes_resumo
+AFTER INSERT OR UPDATE OR DELETE ON contribuicoes
+FOR EACH ROW EXECUTE FUNCTION atualizar_resumo_presentes();
+
+INSERT INTO resumo_presentes (presente_id, contribuicoes, cotas_vendidas, valor_arrecadado, ultima_contribuicao)
+SELECT contribuicoes.presente_id, count(*), COALESCE(sum(contribuicoes.cotas), 0),
+       COALESCE(sum(contribuicoes.valor_total), 0), max(contribuicoes.data)
+FROM contribuicoes
+JOIN presentes ON presentes.id = contribuicoes.presente_id
+GROUP BY contribuicoes.presente_id
+ON CONFLICT (presente_id) DO NOTHING;
@@ -0,0 +1,18 @@
+-- Avisa os workers (LISTEN cotas_presentes) sempre que as cotas de um presente
+-- mudam. O NOTIFY só é entregue no COMMIT, então nenhum navegador vê uma
+-- reserva que acabou em rollback.
+CREATE OR REPLACE FUNCTION notificar_cotas() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('cotas_presentes', json_build_object('id', OLD.id, 'cotas_restantes', NULL)::text);
+    ELSIF TG_OP = 'INSERT' OR OLD.cotas_restantes IS DISTINCT FROM NEW.cotas_restantes THEN
+        PERFORM pg_notify('cotas_presentes', json_build_object('id', NEW.id, 'cotas_restantes', NEW.cotas_restantes)::text);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS presentes_notificar_cotas ON presentes;
+CREATE TRIGGER presentes_notificar_cotas
+AFTER INSERT OR DELETE OR UPDATE OF cotas_restantes ON presentes
+FOR EACH ROW EXECUTE FUNCTION notificar_cotas();
@@ -0,0 +1,25 @@
+-- txid único por contribuição (vai no campo 62-05 do payload PIX) e o
+-- resultado da conciliação com o extrato do banco
+
+-- Mudar só o txid ou o status não altera o resumo do painel. O trigger é
+-- recriado antes do preenchimento dos txids abaixo, senão cada linha
+-- existente passaria pelo recálculo do resumo
+DROP TRIGGER IF EXISTS contribuicoes_resumo ON contribuicoes;
+CREATE TRIGGER contribuicoes_resumo
+AFTER INSERT OR DELETE OR UPDATE OF presente_id, cotas, valor_total, data ON contribuicoes
+FOR EACH ROW EXECUTE FUNCTION atualizar_resumo_presentes();
+
+ALTER TABLE contribuicoes ADD COLUMN IF NOT EXISTS txid TEXT;
+ALTER TABLE contribuicoes
+    ALTER COLUMN txid SET DEFAULT ('LC' || upper(substr(md5(random()::text || clock_timestamp()::text), 1, 20)));
+UPDATE contribuicoes SET txid = DEFAULT WHERE txid IS NULL;
+ALTER TABLE contribuicoes ALTER COLUMN txid SET NOT NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS contribuicoes_txid_idx ON contribuicoes (txid);
+
+ALTER TABLE contribuicoes ADD COLUMN IF NOT EXISTS status_pagamento TEXT NOT NULL DEFAULT 'pendente'
+    CHECK (status_pagamento IN ('pendente', 'pago', 'sem_correspondencia', 'ambiguo'));
+ALTER TABLE contribuicoes ADD COLUMN IF NOT EXISTS pago_em TIMESTAMPTZ;
+-- FITID/identificador do lançamento: o mesmo crédito nunca paga duas contribuições
+ALTER TABLE contribuicoes ADD COLUMN IF NOT EXISTS transacao_banco TEXT;
+CREATE UNIQUE INDEX IF NOT EXISTS contribuicoes_transacao_banco_idx ON contribuicoes (transacao_banco);
+CREATE INDEX IF NOT EXISTS contribuicoes_em_aberto_idx ON contribuicoes (data) WHERE status_pagamento <> 'pago';
@@ -0,0 +1,35 @@
+-- Busca por nome sem acentos e tolerante a erros de digitação: nome_busca()
+-- normaliza como fila.normalizar_nome() e os índices GIN de trigramas atendem
+-- tanto LIKE '%...%' quanto o operador <<% (strict_word_similarity).
+-- Se o banco não permitir criar as extensões, nada disso é criado e o app
+-- filtra em Python (busca.py).
+DO $$
+BEGIN
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    CREATE EXTENSION IF NOT EXISTS unaccent;
+EXCEPTION WHEN insufficient_privilege OR undefined_file OR feature_not_supported THEN
+    RAISE NOTICE 'pg_trgm/unaccent indisponíveis (%): a busca usará o filtro em Python', SQLERRM;
+END
+$$;
+
+DO $$
+DECLARE
+    esquema TEXT;
+BEGIN
+    SELECT extnamespace::regnamespace::text INTO esquema FROM pg_extension WHERE extname = 'unaccent';
+    IF esquema IS NULL OR NOT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+        RETURN;
+    END IF;
+    -- unaccent() é STABLE; a forma com dicionário explícito pode ser usada num índice
+    EXECUTE format($f$
+        CREATE OR REPLACE FUNCTION nome_busca(texto TEXT) RETURNS TEXT
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $b$
+            SELECT btrim(regexp_replace(lower(%1$s.unaccent(%2$L::regdictionary, COALESCE(texto, ''))), '\s+', ' ', 'g'))
+        $b$
+    $f$, esquema, esquema || '.unaccent');
+    CREATE INDEX IF NOT EXISTS confirmacoes_nome_trgm_idx
+        ON confirmacoes USING gin (nome_busca(nome) gin_trgm_ops);
+    CREATE INDEX IF NOT EXISTS contribuicoes_nome_convidado_trgm_idx
+        ON contribuicoes USING gin (nome_busca(nome_convidado) gin_trgm_ops);
+END
+$$;
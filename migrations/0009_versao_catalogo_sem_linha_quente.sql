@@ -0,0 +1,7 @@
+-- A linha única de catalogo_versao era atualizada por toda escrita em
+-- presentes (inclusive cada reserva de cotas), serializando as reservas
+-- nesse lock. A versão passa a ser calculada a partir do xmin das linhas
+-- de presentes (app.consultar_versao_catalogo), sem escrita nenhuma.
+DROP TRIGGER IF EXISTS presentes_versao_catalogo ON presentes;
+DROP FUNCTION IF EXISTS incrementar_versao_catalogo();
+DROP TABLE IF EXISTS catalogo_versao;
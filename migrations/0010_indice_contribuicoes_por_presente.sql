@@ -0,0 +1,6 @@
+-- O filtro por presente da listagem de contribuições pagina por (data, id)
+-- decrescente dentro de um presente_id; com este índice cada página é uma
+-- busca direta. Ele também atende tudo o que usava contribuicoes_presente_id_idx
+-- (FK, max(data) do resumo), que fica redundante.
+CREATE INDEX IF NOT EXISTS contribuicoes_presente_data_idx ON contribuicoes (presente_id, data DESC, id DESC);
+DROP INDEX IF EXISTS contribuicoes_presente_id_idx;
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import tempfile
+import time
+import urllib.request
+from io import BytesIO
+
+from flask import send_from_directory
+from PIL import Image
+
+PASTA = os.getenv("MINIATURAS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'miniaturas'))
+LIMITE_BYTES = int(os.getenv("MINIATURAS_MAX_MB", "100")) * 1024 * 1024
+# O card da lista tem 12rem (192px) de altura; o dobro cobre telas de alta densidade
+TAMANHO = (480, 384)
+MAX_ORIGINAL = 20 * 1024 * 1024
+TIMEOUT = float(os.getenv("MINIATURAS_TIMEOUT", "10"))
+# Depois de uma falha, o mesmo endereço só é baixado de novo após esse tempo
+ESPERA_FALHA = float(os.getenv("MINIATURAS_ESPERA_FALHA", "300"))
+_falhas = {}
+
+
+class ErroMiniatura(Exception):
+    pass
+
+
+def caminho(presente_id):
+    return os.path.join(PASTA, f'{presente_id}.webp')
+
+
+def versao(imagem_url):
+    # Entra na URL da miniatura para que uma imagem nova não pegue o cache antigo do navegador
+    return hashlib.sha1((imagem_url or '').encode('utf-8')).hexdigest()[:8]
+
+
+def baixar(url):
+    pedido = urllib.request.Request(url, headers={'User-Agent': 'lista-casamento/1.0'})
+    try:
+        with urllib.request.urlopen(pedido, timeout=TIMEOUT) as resp:
+            dados = resp.read(MAX_ORIGINAL + 1)
+    except (OSError, ValueError) as e:
+        raise ErroMiniatura(f"Não foi possível baixar {url}: {e}")
+    if len(dados) > MAX_ORIGINAL:
+        raise ErroMiniatura(f"Imagem maior que {MAX_ORIGINAL // (1024 * 1024)} MB: {url}")
+    return dados
+
+
+def gerar(presente_id, url):
+    dados = baixar(url)
+    try:
+        with Image.open(BytesIO(dados)) as imagem:
+            imagem.draft('RGB', TAMANHO)
+            imagem.thumbnail(TAMANHO, Image.LANCZOS)
+            if imagem.mode not in ('RGB', 'RGBA'):
+                imagem = imagem.convert('RGBA')
+            buffer = BytesIO()
+            imagem.save(buffer, format='WEBP', quality=80, method=6)
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ErroMiniatura(f"Imagem inválida em {url}: {e}")
+
+    os.makedirs(PASTA, exist_ok=True)
+    destino = caminho(presente_id)
+    # Um temporário por chamada: duas threads podem gerar o mesmo presente ao mesmo tempo
+    descritor, temporario = tempfile.mkstemp(dir=PASTA, suffix='.tmp')
+    with os.fdopen(descritor, 'wb') as f:
+        f.write(buffer.getvalue())
+    try:
+        os.replace(temporario, destino)
+    except OSError as e:
+        # Corrida com outra geração do mesmo presente: se a miniatura dela já está lá, serve
+        try:
+            os.remove(temporario)
+        except FileNotFoundError:
+            pass
+        if not os.path.exists(destino):
+            raise ErroMiniatura(f"Não foi possível gravar a miniatura de {url}: {e}")
+    limpar()
+    return destino
+
+
+def falhou_recentemente(presente_id, url):
+    falha = _falhas.get(presente_id)
+    return falha is not None and falha[0] == url and falha[1] > time.monotonic()
+
+
+def gerar_sob_demanda(presente_id, url):
+    # Para o primeiro acesso: não insiste num endereço que acabou de falhar
+    if falhou_recentemente(presente_id, url):
+        raise ErroMiniatura(f"Falha recente ao gerar a miniatura de {url}")
+    try:
+        return gerar(presente_id, url)
+    except ErroMiniatura:
+        _falhas[presente_id] = (url, time.monotonic() + ESPERA_FALHA)
+        raise
+
+
+def remover(presente_id):
+    try:
+        os.remove(caminho(presente_id))
+    except FileNotFoundError:
+        pass
+
+
+def limpar(limite=None):
+    # LRU pelo atime, que servir() atualiza a cada acesso; o mtime fica intacto
+    # porque é ele que entra no ETag
+    limite = LIMITE_BYTES if limite is None else limite
+    arquivos = []
+    total = 0
+    for entrada in os.scandir(PASTA):
+        if entrada.name.endswith('.webp'):
+            st = entrada.stat()
+            arquivos.append((st.st_atime, st.st_size, entrada.path))
+            total += st.st_size
+    for _, tamanho, arquivo in sorted(arquivos):
+        if total <= limite:
+            break
+        try:
+            os.remove(arquivo)
+        except FileNotFoundError:
+            pass
+        total -= tamanho
+
+
+def servir(presente_id):
+    arquivo = caminho(presente_id)
+    st = os.stat(arquivo)
+    os.utime(arquivo, (time.time(), st.st_mtime))
+    response = send_from_directory(PASTA, os.path.basename(arquivo), mimetype='image/webp', max_age=31536000)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
@@ -0,0 +1,55 @@
+import hashlib
+import os
+from functools import lru_cache
+from io import BytesIO
+
+import crcmod
+import qrcode
+
+PIX_KEY = "43130257829"
+NOME = "LUCAS HENRIQUE R RAUGI"
+CIDADE = "MATAO"
+
+
+def _campo(id_campo, valor):
+    return f"{id_campo}{len(valor):02d}{valor}"
+
+
+def _montar_campos_fixos():
+    gui = "BR.GOV.BCB.PIX"
+    merchant_account_info = _campo("00", gui) + _campo("01", PIX_KEY)
+    prefixo = (
+        "000201"
+        + _campo("26", merchant_account_info)
+        + "52040000"
+        + "5303986"
+    )
+    sufixo = (
+        "5802BR"
+        + _campo("59", NOME.strip()[:25])
+        + _campo("60", CIDADE.strip()[:15])
+    )
+    return prefixo, sufixo
+
+
+# Tudo que não depende do valor e do txid é montado uma única vez, assim como a tabela do CRC
+_PREFIXO, _SUFIXO = _montar_campos_fixos()
+_crc16 = crcmod.predefined.mkCrcFun('crc-ccitt-false')
+
+
+def gerar_payload_pix(valor: float, txid: str = "***") -> str:
+    # txid (campo 62-05) identifica a contribuição no extrato; "***" = sem identificador
+    payload_sem_crc = _PREFIXO + _campo("54", f"{valor:.2f}") + _SUFIXO + _campo("62", _campo("05", txid)) + "6304"
+    crc = format(_crc16(payload_sem_crc.encode('utf-8')), '04X')
+    return payload_sem_crc + crc
+
+
+@lru_cache(maxsize=int(os.getenv("PIX_QR_CACHE", "256")))
+def qr_png(valor_str: str, txid: str = "***"):
+    # Cacheado por (valor formatado, txid): o convidado que recarrega a página
+    # de agradecimento não gera o PNG de novo. Devolve (png, etag).
+    qr = qrcode.make(gerar_payload_pix(float(valor_str), txid))
+    buffer = BytesIO()
+    qr.save(buffer, format="PNG")
+    png = buffer.getvalue()
+    return png, hashlib.md5(png).hexdigest()
@@ -0,0 +1,74 @@
+def painel(conn):
+    # Uma linha por presente: custo proporcional ao número de presentes, não de contribuições
+    c = conn.cursor()
+    c.execute('''
+        SELECT
+            presentes.id,
+            presentes.nome,
+            presentes.valor_total,
+            presentes.cotas_total,
+            presentes.cotas_restantes,
+            COALESCE(resumo_presentes.contribuicoes, 0) AS contribuicoes,
+            COALESCE(resumo_presentes.cotas_vendidas, 0) AS cotas_vendidas,
+            COALESCE(resumo_presentes.valor_arrecadado, 0) AS valor_arrecadado,
+            resumo_presentes.ultima_contribuicao
+        FROM presentes
+        LEFT JOIN resumo_presentes ON resumo_presentes.presente_id = presentes.id
+        ORDER BY presentes.nome
+    ''')
+    presentes = c.fetchall()
+    for presente in presentes:
+        presente['percentual'] = (
+            100 * presente['valor_arrecadado'] / presente['valor_total'] if presente['valor_total'] else 0
+        )
+    totais = {
+        'presentes': len(presentes),
+        'contribuicoes': sum(p['contribuicoes'] for p in presentes),
+        'cotas_vendidas': sum(p['cotas_vendidas'] for p in presentes),
+        'cotas_total': sum(p['cotas_total'] for p in presentes),
+        'valor_arrecadado': sum(p['valor_arrecadado'] for p in presentes),
+        'valor_total': sum(p['valor_total'] for p in presentes),
+        'ultima_contribuicao': max((p['ultima_contribuicao'] for p in presentes if p['ultima_contribuicao']), default=None),
+    }
+    totais['percentual'] = 100 * totais['valor_arrecadado'] / totais['valor_total'] if totais['valor_total'] else 0
+    return presentes, totais
+
+
+def reconciliar(conn):
+    # Recalcula o resumo do zero e devolve as linhas que estavam divergentes.
+    # O lock SHARE impede escritas em contribuicoes enquanto o recálculo roda.
+    c = conn.cursor()
+    try:
+        c.execute('LOCK TABLE contribuicoes IN SHARE MODE')
+        c.execute('LOCK TABLE resumo_presentes IN EXCLUSIVE MODE')
+        c.execute('''
+            CREATE TEMP TABLE resumo_recalculado ON COMMIT DROP AS
+            SELECT contribuicoes.presente_id, count(*)::int AS contribuicoes,
+                   COALESCE(sum(contribuicoes.cotas), 0)::int AS cotas_vendidas,
+                   COALESCE(sum(contribuicoes.valor_total), 0)::double precision AS valor_arrecadado,
+                   max(contribuicoes.data) AS ultima_contribuicao
+            FROM contribuicoes
+            JOIN presentes ON presentes.id = contribuicoes.presente_id
+            GROUP BY contribuicoes.presente_id
+        ''')
+        c.execute('''
+            SELECT
+                COALESCE(novo.presente_id, atual.presente_id) AS presente_id,
+                atual.cotas_vendidas AS cotas_antes, novo.cotas_vendidas AS cotas_depois,
+                atual.valor_arrecadado AS valor_antes, novo.valor_arrecadado AS valor_depois
+            FROM resumo_recalculado AS novo
+            FULL JOIN resumo_presentes AS atual ON atual.presente_id = novo.presente_id
+            WHERE COALESCE(atual.contribuicoes, 0) <> COALESCE(novo.contribuicoes, 0)
+               OR COALESCE(atual.cotas_vendidas, 0) <> COALESCE(novo.cotas_vendidas, 0)
+               OR abs(COALESCE(atual.valor_arrecadado, 0) - COALESCE(novo.valor_arrecadado, 0)) > 0.005
+               OR atual.ultima_contribuicao IS DISTINCT FROM novo.ultima_contribuicao
+            ORDER BY 1
+        ''')
+        divergencias = c.fetchall()
+        c.execute('DELETE FROM resumo_presentes')
+        c.execute('INSERT INTO resumo_presentes SELECT * FROM resumo_recalculado')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return divergencias
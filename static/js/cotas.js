@@ -0,0 +1,52 @@
+// Atualiza cotas restantes e o estado "esgotado" sem recarregar a página.
+// Os elementos com data-presente="<id>" recebem os eventos de /eventos/cotas.
+(function () {
+    var script = document.currentScript;
+    if (!window.EventSource || !script) {
+        return;
+    }
+
+    function aplicar(id, restantes) {
+        var esgotado = restantes === null || restantes <= 0;
+        document.querySelectorAll('[data-presente="' + id + '"]').forEach(function (item) {
+            item.querySelectorAll('[data-cotas]').forEach(function (el) {
+                el.textContent = esgotado ? 0 : restantes;
+            });
+            item.querySelectorAll('[data-disponivel]').forEach(function (el) {
+                el.classList.toggle('hidden', esgotado);
+            });
+            item.querySelectorAll('[data-esgotado]').forEach(function (el) {
+                el.classList.toggle('hidden', !esgotado);
+            });
+            item.querySelectorAll('input[name="cotas"][type="number"]').forEach(function (el) {
+                if (esgotado) {
+                    return;
+                }
+                el.max = restantes;
+                if (Number(el.value) > restantes) {
+                    el.value = restantes;
+                }
+            });
+        });
+    }
+
+    var fonte = new EventSource(script.dataset.eventos);
+    fonte.addEventListener('snapshot', function (e) {
+        var estado = JSON.parse(e.data);
+        Object.keys(estado).forEach(function (id) {
+            aplicar(id, estado[id]);
+        });
+        // Presente que sumiu do snapshot foi excluído enquanto a conexão estava fechada
+        if (Object.keys(estado).length) {
+            document.querySelectorAll('[data-presente]').forEach(function (item) {
+                if (!(item.dataset.presente in estado)) {
+                    aplicar(item.dataset.presente, null);
+                }
+            });
+        }
+    });
+    fonte.addEventListener('cotas', function (e) {
+        var dados = JSON.parse(e.data);
+        aplicar(dados.id, dados.cotas_restantes);
+    });
+})();
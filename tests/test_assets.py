@@ -0,0 +1,29 @@
+import unittest
+
+import assets
+
+BANNERS = (
+    '/*! tailwindcss v2.2.19 | MIT License | https://tailwindcss.com*/'
+    '/*! modern-normalize v1.1.0 | MIT License | https://github.com/sindresorhus/modern-normalize */'
+)
+
+
+class TestPurgarCss(unittest.TestCase):
+    def test_banners_nao_grudam_no_seletor(self):
+        css = BANNERS + '*,::after,::before{box-sizing:border-box}'
+        self.assertEqual(assets.purgar_css(css, set()), css)
+
+    def test_comentarios_comuns_saem(self):
+        css = '/* x */.a/* y */,.b{color:red}.c{color:blue}'
+        self.assertEqual(assets.purgar_css(css, {'b'}), '.b{color:red}')
+
+    def test_media_mantem_so_classes_usadas(self):
+        css = '@media (min-width:640px){.sm\\:flex{display:flex}.sm\\:hidden{display:none}}'
+        self.assertEqual(
+            assets.purgar_css(css, {'sm:flex'}),
+            '@media (min-width:640px){.sm\\:flex{display:flex}}',
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
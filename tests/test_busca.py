@@ -0,0 +1,59 @@
+import unittest
+from unittest import mock
+
+import busca
+
+
+class TestCorresponde(unittest.TestCase):
+    def test_trecho_sem_acentos(self):
+        self.assertTrue(busca.corresponde('joao', 'João da Silva'))
+        self.assertTrue(busca.corresponde('CONCEIÇÃO', 'maria da conceicao'))
+
+    def test_palavra_com_erro_de_digitacao(self):
+        self.assertTrue(busca.corresponde('Gabriella', 'Gabriela Souza'))
+        self.assertTrue(busca.corresponde('Fernandez', 'Ana Fernandes'))
+
+    def test_nome_diferente(self):
+        self.assertFalse(busca.corresponde('Pedro', 'Gabriela Souza'))
+        self.assertFalse(busca.corresponde('Ana', None))
+
+
+class TestCondicao(unittest.TestCase):
+    def test_curingas_do_like_sao_literais(self):
+        with mock.patch.object(busca, 'trigramas_no_banco', return_value=True):
+            sql, params = busca.condicao(None, 'confirmacoes', 'nome', '50%_a\\b')
+        self.assertIn('LIKE', sql)
+        self.assertEqual(params, ['50\\%\\_a\\\\b', '50%_a\\b'])
+
+    def test_fallback_em_python_tambem_e_literal(self):
+        self.assertFalse(busca.corresponde('_', 'Ana Souza'))
+        self.assertFalse(busca.corresponde('%', 'Ana Souza'))
+        self.assertTrue(busca.corresponde('_', 'ana_souza'))
+
+
+class TestAgruparDuplicados(unittest.TestCase):
+    def agrupar(self, nomes, janela=busca.JANELA_DUPLICADOS):
+        itens = [{'chave': i, 'nome': nome} for i, nome in enumerate(nomes)]
+        return [sorted(item['nome'] for item in grupo) for grupo in busca.agrupar_duplicados(itens, janela)]
+
+    def test_acentos_caixa_e_espacos(self):
+        self.assertEqual(
+            self.agrupar(['João Silva', 'joao  silva', 'Maria Souza']),
+            [['João Silva', 'joao  silva']],
+        )
+
+    def test_erro_de_digitacao_e_nome_contido(self):
+        grupos = self.agrupar(['Fernanda Oliveira', 'Fernanda Olivera', 'Fernanda Oliveira Costa', 'Carlos Lima'])
+        self.assertEqual(grupos, [['Fernanda Oliveira', 'Fernanda Oliveira Costa', 'Fernanda Olivera']])
+
+    def test_erro_no_primeiro_nome(self):
+        # Na ordem alfabética os dois ficam longe; a ordem com as palavras invertidas os aproxima
+        nomes = ['Kátia Andrade', 'Catia Andrade'] + [f'Bruno {sobrenome}' for sobrenome in ('Alves', 'Barros', 'Costa', 'Dias')]
+        self.assertEqual(self.agrupar(nomes, janela=1), [['Catia Andrade', 'Kátia Andrade']])
+
+    def test_sem_duplicados(self):
+        self.assertEqual(self.agrupar(['Ana Paula', 'Beatriz Rocha', 'Carlos Lima']), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
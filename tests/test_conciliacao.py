@@ -0,0 +1,144 @@
+import unittest
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import conciliacao
+
+FUSO = ZoneInfo('America/Sao_Paulo')
+
+OFX = '''OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20261010143000[-3:BRT]<TRNAMT>150.00<FITID>F1<MEMO>PIX RECEBIDO LC0123456789ABCDEF0123
+</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20261010150000[-3:BRT]<TRNAMT>-20.00<FITID>F2<MEMO>TARIFA
+</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+'''
+
+CSV = '''Extrato de conta corrente
+Período: 01/10/2026 a 15/10/2026
+Data;Histórico;Valor
+10/10/2026 14:30;PIX RECEBIDO MARIA;1.250,00
+10/10/2026 14:30;PIX RECEBIDO MARIA;1.250,00
+11/10/2026;TARIFA;-12,50
+'''
+
+
+def contribuicao(id, valor, data, txid=None, status='pendente', transacao=None):
+    return {
+        'id': id, 'txid': txid or f'LC{id:020X}', 'valor_total': valor, 'data': data,
+        'nome_convidado': f'Convidado {id}', 'status_pagamento': status, 'transacao_banco': transacao,
+        'nome': 'Presente',
+    }
+
+
+def lancamento(id, centavos, data, descricao=''):
+    return {'id': id, 'centavos': centavos, 'data': data, 'descricao': descricao}
+
+
+class TestCentavos(unittest.TestCase):
+    def test_formatos(self):
+        casos = {
+            '1.234,56': 123456, 'R$ 1.250,00': 125000, '150.00': 15000, '+5': 500,
+            '-20,00': -2000, '20,00-': -2000, '10,00 D': -1000, '10,00C': 1000,
+        }
+        for texto, centavos in casos.items():
+            with self.subTest(texto=texto):
+                self.assertEqual(conciliacao._centavos(texto), centavos)
+
+    def test_valores_invalidos(self):
+        for texto in ('NaN', 'Infinity', '-inf', '1E9999', 'abc', '', '-'):
+            with self.subTest(texto=texto), self.assertRaises(conciliacao.ErroExtrato) as erro:
+                conciliacao._centavos(texto)
+            self.assertIn(repr(texto), str(erro.exception))
+
+
+class TestLerExtrato(unittest.TestCase):
+    def test_ofx_so_creditos(self):
+        creditos = conciliacao.ler_extrato(OFX.encode('utf-8'), 'extrato.ofx', FUSO)
+        self.assertEqual(len(creditos), 1)
+        self.assertEqual(creditos[0]['id'], 'F1')
+        self.assertEqual(creditos[0]['centavos'], 15000)
+        self.assertEqual(creditos[0]['data'].utcoffset(), timedelta(hours=-3))
+        self.assertIn('LC0123456789ABCDEF0123', creditos[0]['descricao'])
+
+    def test_csv_com_titulo_e_latin1(self):
+        creditos = conciliacao.ler_extrato(CSV.encode('latin-1'), 'extrato.csv', FUSO)
+        self.assertEqual([c['centavos'] for c in creditos], [125000, 125000])
+        # Linhas idênticas sem identificador do banco ganham ids diferentes e estáveis
+        self.assertNotEqual(creditos[0]['id'], creditos[1]['id'])
+        de_novo = conciliacao.ler_extrato(CSV.encode('latin-1'), 'extrato.csv', FUSO)
+        self.assertEqual([c['id'] for c in creditos], [c['id'] for c in de_novo])
+
+    def test_data_impossivel_no_ofx(self):
+        for data in ('20260231120000', '20261010250000', '20261010120000[+99:XXX]'):
+            with self.subTest(data=data), self.assertRaises(conciliacao.ErroExtrato):
+                conciliacao.ler_extrato(OFX.replace('20261010143000[-3:BRT]', data).encode('utf-8'), 'x.ofx', FUSO)
+
+    def test_csv_sem_cabecalho(self):
+        with self.assertRaises(conciliacao.ErroExtrato):
+            conciliacao.ler_extrato('a;b\n1;2\n'.encode('utf-8'), 'x.csv', FUSO)
+
+
+class TestConciliar(unittest.TestCase):
+    def setUp(self):
+        self.base = datetime(2026, 10, 10, 14, 0, tzinfo=FUSO)
+
+    def test_txid_na_descricao(self):
+        alvo = contribuicao(1, 150.0, self.base, txid='LC0123456789ABCDEF0123')
+        outra = contribuicao(2, 150.0, self.base)
+        credito = lancamento('F1', 15000, self.base + timedelta(days=5), 'pix lc0123456789abcdef0123')
+        resultado = conciliacao.conciliar([credito], [alvo, outra])
+        self.assertEqual(resultado['pagos'], [(alvo, credito, 'txid')])
+        self.assertEqual(resultado['status'], {1: 'pago', 2: 'sem_correspondencia'})
+
+    def test_valor_e_horario_unico(self):
+        alvo = contribuicao(1, 80.0, self.base)
+        fora_da_janela = contribuicao(2, 80.0, self.base - timedelta(days=5))
+        outro_valor = contribuicao(3, 90.0, self.base)
+        credito = lancamento('F1', 8000, self.base + timedelta(hours=2))
+        resultado = conciliacao.conciliar([credito], [alvo, fora_da_janela, outro_valor])
+        self.assertEqual(resultado['pagos'], [(alvo, credito, 'valor e horário')])
+        self.assertEqual(resultado['ambiguos'], [])
+
+    def test_valor_e_horario_ambiguo(self):
+        a = contribuicao(1, 80.0, self.base)
+        b = contribuicao(2, 80.0, self.base + timedelta(minutes=10))
+        credito = lancamento('F1', 8000, self.base + timedelta(hours=1))
+        resultado = conciliacao.conciliar([credito], [a, b])
+        self.assertEqual(resultado['pagos'], [])
+        self.assertEqual(resultado['ambiguos'], [(credito, [a, b])])
+        self.assertEqual(resultado['status'], {1: 'ambiguo', 2: 'ambiguo'})
+
+    def test_credito_sem_correspondencia(self):
+        credito = lancamento('F1', 1234, self.base)
+        resultado = conciliacao.conciliar([credito], [contribuicao(1, 80.0, self.base)])
+        self.assertEqual(resultado['sem_correspondencia'], [credito])
+
+    def test_fitid_ja_conciliado(self):
+        paga = contribuicao(1, 80.0, self.base, status='pago', transacao='F1')
+        aberta = contribuicao(2, 80.0, self.base)
+        resultado = conciliacao.conciliar([lancamento('F1', 8000, self.base)], [paga, aberta])
+        self.assertEqual(resultado['ja_conciliados'], 1)
+        self.assertEqual(resultado['pagos'], [])
+        self.assertNotIn(1, resultado['status'])
+
+    def test_reenviar_o_mesmo_extrato(self):
+        contribuicoes = [contribuicao(1, 80.0, self.base), contribuicao(2, 50.0, self.base, txid='LC00000000000000000ABC')]
+        creditos = [
+            lancamento('F1', 8000, self.base + timedelta(hours=1)),
+            lancamento('F2', 5000, self.base + timedelta(days=3), 'LC00000000000000000ABC'),
+        ]
+        primeiro = conciliacao.conciliar(creditos, contribuicoes)
+        self.assertEqual(len(primeiro['pagos']), 2)
+        # O que gravar() faria no banco
+        for contrib, credito, _ in primeiro['pagos']:
+            contrib.update(status_pagamento='pago', transacao_banco=credito['id'])
+        segundo = conciliacao.conciliar(creditos, contribuicoes)
+        self.assertEqual(segundo['pagos'], [])
+        self.assertEqual(segundo['ja_conciliados'], 2)
+        self.assertEqual(segundo['status'], {})
+
+
+if __name__ == '__main__':
+    unittest.main()
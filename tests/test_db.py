@@ -0,0 +1,96 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from psycopg2 import extensions
+
+import db
+
+
+class ConexaoFalsa:
+    closed = False
+
+    def get_transaction_status(self):
+        return extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = True
+
+
+class TestTamanhoPool(unittest.TestCase):
+    def test_reserva_a_conexao_listen_de_cada_worker(self):
+        ambiente = {'DB_MAX_CONEXOES': '20', 'WEB_CONCURRENCY': '2', 'DB_POOL_OVERFLOW': '2'}
+        with mock.patch.dict('os.environ', ambiente):
+            tamanho = db.tamanho_pool_padrao()
+        # (pool + overflow + LISTEN) por worker cabe no limite do banco
+        self.assertEqual(tamanho, 7)
+        self.assertLessEqual(2 * (tamanho + 2 + 1), 20)
+
+
+class TestPoolConexoes(unittest.TestCase):
+    def test_devolver_nao_espera_o_handshake(self):
+        pool = db.PoolConexoes('dbname=teste', tamanho=2, overflow=0, timeout=5)
+        liberar = threading.Event()
+
+        def conectar(dsn, **kwargs):
+            if liberar.is_set():
+                return ConexaoFalsa()
+            liberar.wait(5)
+            return ConexaoFalsa()
+
+        with mock.patch('psycopg2.connect', side_effect=conectar) as connect:
+            liberar.set()
+            primeira = pool.obter()
+            liberar.clear()
+            lenta = threading.Thread(target=pool.obter)
+            lenta.start()
+            time.sleep(0.05)
+            inicio = time.monotonic()
+            pool.devolver(primeira)
+            self.assertLess(time.monotonic() - inicio, 0.5)
+            self.assertIs(pool.obter(), primeira)
+            liberar.set()
+            lenta.join()
+        self.assertEqual(connect.call_args.kwargs['connect_timeout'], 5)
+        self.assertEqual(pool.estatisticas()['abertas'], 2)
+
+    def test_rollback_do_devolver_fora_do_lock(self):
+        pool = db.PoolConexoes('dbname=teste', tamanho=2, overflow=0, timeout=5)
+        em_rollback, liberar = threading.Event(), threading.Event()
+
+        class EmTransacao(ConexaoFalsa):
+            def get_transaction_status(self):
+                return extensions.TRANSACTION_STATUS_INTRANS
+
+            def rollback(self):
+                em_rollback.set()
+                liberar.wait(5)
+
+        with mock.patch('psycopg2.connect', side_effect=[EmTransacao(), ConexaoFalsa()]):
+            lenta = pool.obter()
+            devolucao = threading.Thread(target=pool.devolver, args=(lenta,))
+            devolucao.start()
+            self.assertTrue(em_rollback.wait(1))
+            inicio = time.monotonic()
+            outra = pool.obter()
+            pool.devolver(outra)
+            self.assertLess(time.monotonic() - inicio, 0.5)
+            liberar.set()
+            devolucao.join()
+        self.assertEqual(pool.estatisticas()['ociosas'], 2)
+
+    def test_vaga_reservada_conta_no_limite(self):
+        pool = db.PoolConexoes('dbname=teste', tamanho=1, overflow=0, timeout=0.2)
+        with mock.patch('psycopg2.connect', side_effect=OSError('recusada')):
+            with self.assertRaises(OSError):
+                pool.obter()
+        self.assertEqual(pool.estatisticas()['conectando'], 0)
+        with mock.patch('psycopg2.connect', return_value=ConexaoFalsa()):
+            pool.obter()
+            with self.assertRaises(db.PoolEsgotado):
+                pool.obter()
+
+
+if __name__ == '__main__':
+    unittest.main()
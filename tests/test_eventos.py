@@ -0,0 +1,81 @@
+import json
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from eventos import CanalCotas
+
+
+class CanalSemBanco(CanalCotas):
+    def iniciar(self):
+        pass
+
+
+class TestCanalCotas(unittest.TestCase):
+    def setUp(self):
+        self.canal = CanalSemBanco('dbname=teste', buffer=2, heartbeat=5, duracao=60)
+        self.canal.estado = {1: 3}
+
+    def test_snapshot_e_eventos(self):
+        cliente = self.canal.conectar()
+        stream = self.canal.transmitir(cliente)
+        self.assertIn('event: snapshot\ndata: {"1":3}', next(stream))
+        self.canal._receber(json.dumps({'id': 1, 'cotas_restantes': 2}))
+        self.assertEqual(next(stream), 'event: cotas\ndata: {"id":1,"cotas_restantes":2}\n\n')
+        stream.close()
+        self.assertEqual(self.canal.clientes, 0)
+
+    def test_cliente_lento_ganha_snapshot(self):
+        cliente = self.canal.conectar()
+        stream = self.canal.transmitir(cliente)
+        next(stream)
+        for cotas in (2, 1, 0):
+            self.canal._receber(json.dumps({'id': 1, 'cotas_restantes': cotas}))
+        self.assertTrue(cliente.atrasado)
+        self.assertIn('event: snapshot\ndata: {"1":0}', next(stream))
+        self.assertEqual(self.canal.ressincronizacoes, 1)
+        stream.close()
+
+    def test_encerrar_fecha_os_streams(self):
+        cliente = self.canal.conectar()
+        stream = self.canal.transmitir(cliente)
+        next(stream)
+        threading.Timer(0.1, self.canal.encerrar).start()
+        inicio = time.monotonic()
+        self.assertEqual(list(stream), [])
+        self.assertLess(time.monotonic() - inicio, 2)
+        self.assertEqual(self.canal.clientes, 0)
+        self.assertIsNone(self.canal.conectar())
+
+    def test_notify_recebido_no_heartbeat(self):
+        conn = mock.MagicMock(notifies=[])
+        cursor = conn.cursor.return_value
+        cursor.fetchall.return_value = [(1, 3)]
+
+        def executar(sql):
+            if sql == 'SELECT 1':
+                conn.notifies.append(SimpleNamespace(payload=json.dumps({'id': 1, 'cotas_restantes': 0})))
+        cursor.execute.side_effect = executar
+
+        selects = iter([[]])
+
+        def selecionar(*args):
+            try:
+                return [next(selects)]
+            except StopIteration:
+                raise OSError('fim do teste')
+
+        with mock.patch('psycopg2.connect', return_value=conn) as psycopg2_connect, \
+                mock.patch('select.select', side_effect=selecionar):
+            with self.assertRaises(OSError):
+                self.canal._escutar()
+        self.assertEqual(self.canal.estado, {1: 0})
+        self.assertEqual(self.canal.notificacoes, 1)
+        self.assertEqual(psycopg2_connect.call_args.kwargs['tcp_user_timeout'], 10000)
+        conn.close.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
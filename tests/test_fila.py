@@ -0,0 +1,69 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from fila import FilaConfirmacoes, normalizar_nome
+
+
+def linha(nome):
+    return json.dumps({'nome': nome, 'nome_normalizado': normalizar_nome(nome), 'data': '2026-10-10T12:00:00+00:00'}) + '\n'
+
+
+class TestFilaConfirmacoes(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.mkdtemp()
+        self.fila = FilaConfirmacoes(pool=None, pasta=self.pasta)
+        self.inseridos = []
+        self.fila._inserir = self.inseridos.extend
+
+    def tearDown(self):
+        shutil.rmtree(self.pasta)
+
+    def pid_morto(self):
+        processo = subprocess.Popen([sys.executable, '-c', 'pass'])
+        processo.wait()
+        return processo.pid
+
+    def test_recupera_diario_de_worker_morto_com_linha_cortada(self):
+        arquivo = os.path.join(self.pasta, f'diario-{self.pid_morto()}.jsonl')
+        with open(arquivo, 'w', encoding='utf-8') as f:
+            f.write(linha('Ana Souza') + linha('Bruno Lima') + linha('Carla')[:20])
+        self.fila.descarregar()
+        self.assertEqual([item['nome'] for item in self.inseridos], ['Ana Souza', 'Bruno Lima'])
+        self.assertFalse(os.path.exists(arquivo))
+
+    def test_diario_de_worker_vivo_fica(self):
+        arquivo = os.path.join(self.pasta, f'diario-{os.getppid()}.jsonl')
+        with open(arquivo, 'w', encoding='utf-8') as f:
+            f.write(linha('Ana Souza'))
+        self.fila.descarregar()
+        self.assertEqual(self.inseridos, [])
+        self.assertTrue(os.path.exists(arquivo))
+
+    def test_descarregar_grava_o_proprio_diario_sem_repetir_nome(self):
+        self.fila._pid = os.getpid()
+        for nome in ('João Silva', 'joao  silva', 'Maria'):
+            self.fila.enfileirar(nome)
+        self.fila.descarregar()
+        self.assertEqual([item['nome'] for item in self.inseridos], ['João Silva', 'Maria'])
+        self.assertEqual(os.listdir(self.pasta), [])
+
+    def test_falha_no_banco_mantem_o_lote(self):
+        def falhar(itens):
+            raise OSError('banco fora do ar')
+        self.fila._inserir = falhar
+        self.fila._pid = os.getpid()
+        self.fila.enfileirar('Ana')
+        with self.assertRaises(OSError):
+            self.fila.descarregar()
+        self.fila._inserir = self.inseridos.extend
+        self.fila.descarregar()
+        self.assertEqual([item['nome'] for item in self.inseridos], ['Ana'])
+
+
+if __name__ == '__main__':
+    unittest.main()
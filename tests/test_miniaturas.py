@@ -0,0 +1,106 @@
+import http.server
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from io import BytesIO
+
+from flask import Flask
+from PIL import Image
+
+import miniaturas
+
+
+class Imagens(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/foto.png':
+            buffer = BytesIO()
+            Image.new('RGB', (1200, 900), 'purple').save(buffer, format='PNG')
+            corpo, tipo = buffer.getvalue(), 'image/png'
+        else:
+            corpo, tipo = b'<html>nada aqui</html>', 'text/html'
+        self.send_response(200)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestMiniaturas(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.servidor = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Imagens)
+        threading.Thread(target=cls.servidor.serve_forever, daemon=True).start()
+        cls.base = f'http://127.0.0.1:{cls.servidor.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.servidor.shutdown()
+        cls.servidor.server_close()
+
+    def setUp(self):
+        self.pasta = tempfile.mkdtemp()
+        self.pasta_original = miniaturas.PASTA
+        miniaturas.PASTA = self.pasta
+        miniaturas._falhas.clear()
+
+    def tearDown(self):
+        miniaturas.PASTA = self.pasta_original
+        shutil.rmtree(self.pasta)
+
+    def test_gera_webp_reduzido(self):
+        destino = miniaturas.gerar(1, f'{self.base}/foto.png')
+        with Image.open(destino) as imagem:
+            self.assertEqual(imagem.format, 'WEBP')
+            self.assertLessEqual(imagem.width, miniaturas.TAMANHO[0])
+            self.assertLessEqual(imagem.height, miniaturas.TAMANHO[1])
+        self.assertEqual(os.listdir(self.pasta), ['1.webp'])
+
+    def test_conteudo_que_nao_e_imagem(self):
+        with self.assertRaises(miniaturas.ErroMiniatura):
+            miniaturas.gerar(2, f'{self.base}/pagina.html')
+        self.assertEqual(os.listdir(self.pasta), [])
+
+    def test_conexao_recusada_fica_em_espera(self):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            url = f'http://127.0.0.1:{s.getsockname()[1]}/foto.png'
+        with self.assertRaises(miniaturas.ErroMiniatura):
+            miniaturas.gerar_sob_demanda(3, url)
+        self.assertTrue(miniaturas.falhou_recentemente(3, url))
+        self.assertFalse(miniaturas.falhou_recentemente(3, f'{self.base}/foto.png'))
+        miniaturas.gerar_sob_demanda(3, f'{self.base}/foto.png')
+        self.assertTrue(os.path.exists(miniaturas.caminho(3)))
+
+    def test_servir_responde_304_com_etag(self):
+        miniaturas.gerar(4, f'{self.base}/foto.png')
+        app = Flask(__name__)
+        app.add_url_rule('/img/<int:presente_id>', 'img', miniaturas.servir)
+        cliente = app.test_client()
+        primeira = cliente.get('/img/4')
+        self.assertEqual(primeira.status_code, 200)
+        self.assertEqual(primeira.mimetype, 'image/webp')
+        self.assertIn('immutable', primeira.headers['Cache-Control'])
+        segunda = cliente.get('/img/4', headers={'If-None-Match': primeira.headers['ETag']})
+        self.assertEqual(segunda.status_code, 304)
+
+    def test_limpar_despeja_o_menos_acessado(self):
+        for presente_id in (5, 6, 7):
+            miniaturas.gerar(presente_id, f'{self.base}/foto.png')
+        agora = time.time()
+        for presente_id, atime in ((5, agora - 30), (6, agora - 10), (7, agora - 20)):
+            arquivo = miniaturas.caminho(presente_id)
+            os.utime(arquivo, (atime, os.stat(arquivo).st_mtime))
+        tamanho = os.path.getsize(miniaturas.caminho(6))
+        miniaturas.limpar(limite=2 * tamanho)
+        self.assertEqual(sorted(os.listdir(self.pasta)), ['6.webp', '7.webp'])
+
+
+if __name__ == '__main__':
+    unittest.main()